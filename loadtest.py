@@ -0,0 +1,67 @@
+import argparse
+import http.client
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def worker(url, count, keep_alive, conditional, results, lock):
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    connection = None
+    etag = None
+    latencies = []
+    statuses = {}
+    for _ in range(count):
+        if connection is None:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+        headers = {} if keep_alive else {"Connection": "close"}
+        if conditional and etag:
+            headers["If-None-Match"] = etag
+        start = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        etag = response.getheader("ETag", etag)
+        if not keep_alive or response.will_close:
+            connection.close()
+            connection = None
+    if connection is not None:
+        connection.close()
+    with lock:
+        results["latencies"].extend(latencies)
+        for status, hits in statuses.items():
+            results["statuses"][status] = results["statuses"].get(status, 0) + hits
+
+
+def run(url, concurrency, requests, keep_alive=True, conditional=False):
+    results = {"latencies": [], "statuses": {}}
+    lock = threading.Lock()
+    per_worker = max(1, requests // concurrency)
+    threads = [threading.Thread(target=worker, args=(url, per_worker, keep_alive, conditional, results, lock))
+               for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = sorted(results["latencies"])
+    total = len(latencies)
+    print(f"{total} requests in {elapsed:.2f}s: {total / elapsed:.0f} req/s, "
+          f"p50 {latencies[total // 2] * 1000:.2f}ms, p99 {latencies[int(total * 0.99)] * 1000:.2f}ms, "
+          f"statuses {results['statuses']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the preview server")
+    parser.add_argument("url", nargs="?", default="http://localhost:8888/index.html")
+    parser.add_argument("--concurrency", "-c", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", "-n", type=int, default=2000, help="Total requests")
+    parser.add_argument("--no-keep-alive", action="store_true", help="Open a new connection for every request")
+    parser.add_argument("--conditional", action="store_true", help="Revalidate with If-None-Match after the first hit")
+    args = parser.parse_args()
+
+    run(args.url, args.concurrency, args.requests, not args.no_keep_alive, args.conditional)
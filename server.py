@@ -1,18 +1,289 @@
 import os
+import json
+import re
 import argparse
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import threading
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from http import HTTPStatus
+from http.server import HTTPServer, ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+# Precompressed siblings written by the build, in order of preference
+ENCODINGS = [("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz")]
+# Written by the build's --fingerprint, its values are the URLs published under a content hash
+ASSET_MANIFEST = "asset-manifest.json"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class FileCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_file_size=1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_file_size = max_file_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, stat):
+        key = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None:
+                return None
+            if entry[0] != key:
+                # The file changed on disk since it was cached
+                self.size -= len(self.entries.pop(path)[1])
+                return None
+            self.entries.move_to_end(path)
+            return entry[1]
+
+    def accepts(self, size):
+        # With no budget, or for files over the limit, the body is sent from disk instead of being read into memory
+        return size <= self.max_file_size and size <= self.max_bytes
+
+    def put(self, path, stat, data):
+        if not self.accepts(len(data)):
+            return
+        with self.lock:
+            if path in self.entries:
+                self.size -= len(self.entries.pop(path)[1])
+            self.entries[path] = ((stat.st_mtime_ns, stat.st_size), data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class AssetMap:
+    # Fingerprinted URLs never change, so they can be cached forever. The map is reread when the build rewrites it
+    def __init__(self):
+        self.key = None
+        self.urls = frozenset()
+        self.lock = threading.Lock()
+
+    def fingerprinted(self, directory):
+        path = os.path.join(directory, ASSET_MANIFEST)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return frozenset()
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key != self.key:
+                try:
+                    with open(path) as f:
+                        urls = frozenset(json.load(f).values())
+                except (OSError, ValueError, AttributeError, TypeError):
+                    urls = frozenset()
+                self.key, self.urls = key, urls
+            return self.urls
+
+
+class MemoryBody:
+    def __init__(self, data):
+        self.data = data
+
+    def close(self):
+        pass
+
+
+class FileBody:
+    def __init__(self, file, offset, count):
+        self.file = file
+        self.offset = offset
+        self.count = count
+
+    def close(self):
+        self.file.close()
+
+
+class CachingHTTPRequestHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests, SimpleHTTPRequestHandler always sends Content-Length
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes, Nagle would hold the body back on a kept-alive connection
+    disable_nagle_algorithm = True
+    cache_control = "no-cache"
+    file_cache = FileCache()
+    asset_map = AssetMap()
+    quiet = False
+
+    def resolve_file(self):
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            if not self.path.split('?', 1)[0].endswith('/'):
+                return None
+            path = os.path.join(path, "index.html")
+        return path if os.path.isfile(path) else None
+
+    def send_head(self):
+        path = self.resolve_file()
+        if path is None:
+            # Directory redirects, listings and 404s stay with SimpleHTTPRequestHandler
+            return super().send_head()
+        variant, encoding = self.select_variant(path)
+        try:
+            f = open(variant, 'rb')
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+        try:
+            return self.send_file_head(path, variant, f, encoding)
+        except BaseException:
+            f.close()
+            raise
+
+    def accepted_encodings(self):
+        # Encoding -> quality, an explicit q=0 refuses that encoding even when '*' accepts everything else
+        accepted = {}
+        for token in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = token.strip().partition(";")
+            try:
+                quality = float(params.strip().removeprefix("q=")) if params else 1.0
+            except ValueError:
+                continue
+            accepted[name.strip().lower()] = quality
+        return accepted
+
+    def select_variant(self, path):
+        accepted = self.accepted_encodings()
+        if not accepted:
+            return path, None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return path, None
+        for encoding, suffix in ENCODINGS:
+            if accepted.get(encoding, accepted.get("*", 0)) <= 0:
+                continue
+            try:
+                # The build stamps siblings with their source's mtime, anything else is stale
+                if os.stat(path + suffix).st_mtime_ns == mtime:
+                    return path + suffix, encoding
+            except OSError:
+                continue
+        return path, None
+
+    def send_file_head(self, path, variant, f, encoding):
+        stat = os.fstat(f.fileno())
+        size = stat.st_size
+        etag = f'"{size:x}-{stat.st_mtime_ns:x}{"-" + encoding if encoding else ""}"'
+        if self.etag_matches(etag) or self.not_modified_since(stat):
+            f.close()
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_common_headers(path, stat, etag)
+            self.end_headers()
+            return None
+
+        byte_range = self.requested_range(size, etag)
+        if byte_range == "unsatisfiable":
+            f.close()
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        start, end = byte_range if byte_range else (0, size - 1)
+
+        if self.file_cache.accepts(size):
+            data = self.file_cache.get(variant, stat)
+            if data is None:
+                data = f.read()
+                self.file_cache.put(variant, stat, data)
+            f.close()
+            body = MemoryBody(memoryview(data)[start:end + 1])
+        else:
+            body = FileBody(f, start, end + 1 - start)
+
+        if byte_range:
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", self.guess_type(path))
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(end + 1 - start))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_common_headers(path, stat, etag)
+        self.end_headers()
+        return body
+
+    def send_common_headers(self, path, stat, etag):
+        self.send_header("Last-Modified", formatdate(stat.st_mtime, usegmt=True))
+        self.send_header("ETag", etag)
+        url = "/" + os.path.relpath(path, self.directory).replace(os.sep, "/")
+        if url in self.asset_map.fingerprinted(self.directory):
+            self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+        else:
+            self.send_header("Cache-Control", self.cache_control)
+        self.send_header("Vary", "Accept-Encoding")
+
+    def etag_matches(self, etag):
+        header = self.headers.get("If-None-Match")
+        if header is None:
+            return False
+        if header.strip() == "*":
+            return True
+        return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+    def not_modified_since(self, stat):
+        header = self.headers.get("If-Modified-Since")
+        if header is None or "If-None-Match" in self.headers:
+            return False
+        try:
+            since = parsedate_to_datetime(header)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        return since.tzinfo is not None and int(stat.st_mtime) <= since.timestamp()
+
+    def requested_range(self, size, etag):
+        header = self.headers.get("Range")
+        if header is None:
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range.strip() != etag:
+            return None
+        match = RANGE_RE.match(header.strip())
+        if match is None:
+            # Multiple ranges and other units are answered with the whole file
+            return None
+        first, last = match.groups()
+        if not first and not last:
+            return None
+        if not first:
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        if start >= size or start > end:
+            return "unsatisfiable"
+        return start, end
+
+    def copyfile(self, source, outputfile):
+        if isinstance(source, MemoryBody):
+            outputfile.write(source.data)
+        elif isinstance(source, FileBody):
+            # Large files go from the page cache straight to the socket
+            self.connection.sendfile(source.file, source.offset, source.count)
+        else:
+            super().copyfile(source, outputfile)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
 
 
 def run(
-    server_class=HTTPServer,
-    handler_class=SimpleHTTPRequestHandler,
+    server_class=ThreadingHTTPServer,
+    handler_class=CachingHTTPRequestHandler,
     port=8888,
     directory=None,
 ):
-    if directory:  # Change the current working directory if directory is specified
-        os.chdir(directory)
+    # The handler resolves paths against the directory on every request, so a swapped public/ is picked up
+    handler = partial(handler_class, directory=directory) if directory else handler_class
     server_address = ("", port)
-    httpd = server_class(server_address, handler_class)
+    httpd = server_class(server_address, handler)
     print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
     httpd.serve_forever()
 
@@ -23,6 +294,28 @@ if __name__ == "__main__":
         "--dir", type=str, help="Directory to serve files from", default="."
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--cache-control", type=str, help="Cache-Control header sent with every file",
+        default=CachingHTTPRequestHandler.cache_control
+    )
+    parser.add_argument(
+        "--cache-size", type=int, help="Memory cache for hot files in MiB, 0 disables it", default=64
+    )
+    parser.add_argument(
+        "--cache-file-limit", type=int, default=1024,
+        help="Files up to this many KiB are served from memory, larger ones with sendfile"
+    )
+    parser.add_argument(
+        "--single-threaded", action="store_true", help="Handle one request at a time like the old server"
+    )
+    parser.add_argument("--quiet", action="store_true", help="Don't log every request")
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
\ No newline at end of file
+    CachingHTTPRequestHandler.cache_control = args.cache_control
+    CachingHTTPRequestHandler.file_cache = FileCache(args.cache_size * 1024 * 1024, args.cache_file_limit * 1024)
+    CachingHTTPRequestHandler.quiet = args.quiet
+    run(
+        server_class=HTTPServer if args.single_threaded else ThreadingHTTPServer,
+        port=args.port,
+        directory=args.dir,
+    )
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import re
+
+from htmlnode import LeafNode, ParentNode
+from utility import atomic_write, hash_file, sync_dir_to_new_dir
+
+ASSET_MANIFEST = "asset-manifest.json"
+FINGERPRINT_LENGTH = 8
+URL_ATTRIBUTES = ("href", "src")
+URL_ATTRIBUTE_RE = re.compile(r"""(\b(?:href|src)\s*=\s*)(["'])(.*?)\2""", re.IGNORECASE)
+
+
+def fingerprinted_path(rel_path, digest):
+    base, extension = os.path.splitext(rel_path)
+    return f"{base}.{digest[:FINGERPRINT_LENGTH]}{extension}"
+
+
+def asset_url(rel_path):
+    return "/" + rel_path.replace(os.sep, "/")
+
+
+def cached_digest(src, rel_path, digests, seen):
+    # A file whose mtime and size match the last build keeps its digest without being read again
+    stat = os.stat(src)
+    key = [stat.st_mtime_ns, stat.st_size]
+    cached = digests.get(rel_path)
+    digest = cached["digest"] if cached is not None and cached["stat"] == key else hash_file(src)
+    seen[rel_path] = {"stat": key, "digest": digest}
+    return digest
+
+
+def fingerprint_dir_to_new_dir(old, new, link="copy", checksum=False, keep=(), digests=None):
+    # Maps the URL a file was published under to its content-addressed URL, e.g. /index.css -> /index.3f2a1c8d.css.
+    # digests is the manifest's record of each file's hash, updated in place
+    assets = {}
+    previous = dict(digests) if digests is not None else {}
+    seen = {}
+
+    def rename(rel_path, src):
+        fingerprinted = fingerprinted_path(rel_path, cached_digest(src, rel_path, previous, seen))
+        assets[asset_url(rel_path)] = asset_url(fingerprinted)
+        return fingerprinted
+
+    synced = sync_dir_to_new_dir(old, new, link, checksum, set(keep) | {ASSET_MANIFEST}, rename)
+    if digests is not None:
+        # Removed files drop out so the record doesn't grow forever
+        digests.clear()
+        digests.update(seen)
+    if synced is None:
+        return assets
+    with atomic_write(os.path.join(new, ASSET_MANIFEST)) as f:
+        json.dump(assets, f, indent=1, sort_keys=True)
+    return assets
+
+
+def assets_digest(assets):
+    if not assets:
+        return ""
+    return hashlib.sha256(json.dumps(assets, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def resolve_asset_url(url, assets):
+    # Query strings and fragments ride along, only root-relative URLs can be matched against the manifest
+    path, separator, rest = url.partition("?") if "?" in url else url.partition("#")
+    fingerprinted = assets.get(path)
+    if fingerprinted is None:
+        return url
+    return fingerprinted + separator + rest
+
+
+def rewrite_asset_references(text, assets):
+    def replace(match):
+        return match.group(1) + match.group(2) + resolve_asset_url(match.group(3), assets) + match.group(2)
+    return URL_ATTRIBUTE_RE.sub(replace, text)
+
+
+def rewrite_asset_urls(node, assets):
+    # Copy-on-write, untouched subtrees are shared with the original tree
+    props = node.props
+    for attribute in URL_ATTRIBUTES:
+        url = props.get(attribute)
+        if url is not None:
+            resolved = resolve_asset_url(url, assets)
+            if resolved != url:
+                if props is node.props:
+                    props = dict(props)
+                props[attribute] = resolved
+
+    children = node.children
+    if children:
+        for i, child in enumerate(node.children):
+            rewritten = rewrite_asset_urls(child, assets)
+            if rewritten is not child:
+                if children is node.children:
+                    children = list(children)
+                children[i] = rewritten
+
+    if props is node.props and children is node.children:
+        return node
+    if isinstance(node, ParentNode):
+        return ParentNode(node.tag, children, props)
+    return LeafNode(node.value, node.tag, props)
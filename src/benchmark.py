@@ -0,0 +1,415 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from utility import *
+from blocks import *
+
+
+def chained_text_to_text_nodes(text):
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+def rescanning_split_nodes_image(old_nodes):
+    new_nodes = []
+    for node in old_nodes:
+        text = node.text
+        image_tuples = extract_markdown_images(text)
+        if not image_tuples:
+            if text != "":
+                new_nodes.append(node)
+        else:
+            for image_tup in image_tuples:
+                split_node = text.split(f"![{image_tup[0]}]({image_tup[1]})", 1)
+                if split_node[0] != "":
+                    new_nodes.append(TextNode(split_node[0], TextType.TEXT))
+                new_nodes.append(TextNode(image_tup[0], TextType.IMAGE, image_tup[1]))
+                text = split_node[1]
+            if text != '':
+                new_nodes.append(TextNode(text, TextType.TEXT))
+    return new_nodes
+
+
+def rescanning_split_nodes_link(old_nodes):
+    new_nodes = []
+    for node in old_nodes:
+        text = node.text
+        link_tuples = extract_markdown_links(text)
+        if not link_tuples:
+            if text != "":
+                new_nodes.append(node)
+        else:
+            for link_tup in link_tuples:
+                split_node = text.split(f"[{link_tup[0]}]({link_tup[1]})", 1)
+                if split_node[0] != "":
+                    new_nodes.append(TextNode(split_node[0], TextType.TEXT))
+                new_nodes.append(TextNode(link_tup[0], TextType.LINK, link_tup[1]))
+                text = split_node[1]
+            if text != '':
+                new_nodes.append(TextNode(text, TextType.TEXT))
+    return new_nodes
+
+
+def rescanning_block_to_block_type(block):
+    if block[0] == '#' and block[:7] != '#######':
+        return BlockType.HEADING
+    elif block[:3] == '```' and block[-3:] == '```':
+        return BlockType.CODE
+    elif block[0] == '>':
+        quote = True
+        for line in block.split('\n'):
+            if line[0] != '>':
+                quote = False
+                break
+        if quote:
+            return BlockType.QUOTE
+    elif block[:2] == '* ' or block[:2] == '- ':
+        unordered = True
+        for line in block.split('\n'):
+            if line[:2] != '* ' and line[:2] != '- ':
+                unordered = False
+                break
+        if unordered:
+            return BlockType.UNORDERED_LIST
+    elif block[:3] == '1. ':
+        ordered = True
+        i = 1
+        for line in block.split('\n'):
+            if line[:3] != f'{i}. ':
+                ordered = False
+                break
+            i += 1
+        if ordered:
+            return BlockType.ORDERED_LIST
+    return BlockType.PARAGRAPH
+
+
+def generate_link_text(links):
+    return " ".join(f"see [page {i}](/pages/{i}) and ![icon {i}](/icons/{i}.png)," for i in range(links))
+
+
+def generate_inline_text(words, seed=0):
+    rng = random.Random(seed)
+    parts = []
+    for i in range(words):
+        roll = rng.random()
+        if roll < 0.05:
+            parts.append(f"**bold {i}**")
+        elif roll < 0.10:
+            parts.append(f"*italic {i}*")
+        elif roll < 0.14:
+            parts.append(f"`code {i}`")
+        elif roll < 0.17:
+            parts.append(f"[link {i}](https://example.com/{i})")
+        elif roll < 0.19:
+            parts.append(f"![image {i}](/images/{i}.png)")
+        else:
+            parts.append(f"word{i}")
+    return " ".join(parts)
+
+
+def generate_paragraphs(size):
+    return "\n\n".join(["# Long paragraphs"] + [generate_inline_text(200, seed) for seed in range(size)])
+
+
+def generate_lists(size):
+    blocks = ["# Lists"]
+    for i in range(size):
+        if i % 2:
+            blocks.append("\n".join(f"{n}. item {n} with *emphasis* and `code`" for n in range(1, 51)))
+        else:
+            blocks.append("\n".join(f"- item {n} with a [link](/items/{n})" for n in range(50)))
+    blocks.extend(f"> quoted line {n} of block {i}" for n in range(size))
+    return "\n\n".join(blocks)
+
+
+def generate_quotes(size):
+    blocks = ["# Quotes"]
+    for i in range(size):
+        blocks.append("\n".join(f"> line {n} of quote {i}, with *emphasis* now and then" for n in range(30)))
+        blocks.append("\n".join(f"- short item {n}" for n in range(8)))
+    return "\n\n".join(blocks)
+
+
+def generate_link_page(size):
+    return "\n\n".join(["# Link index"] + [generate_link_text(100) for _ in range(size)])
+
+
+def generate_code_blocks(size):
+    lines = [f"    value_{n} = compute({n}) + offset" for n in range(200)]
+    return "\n\n".join(["# Code"] + ["```\n" + "\n".join(lines) + "\n```" for _ in range(size)])
+
+
+def generate_boilerplate(size):
+    # Docs pages share their nav lists, notices and snippets, only the prose in between differs
+    nav = "\n".join(f"- [Section {n}](/docs/section{n})" for n in range(20))
+    notice = "This page is part of the *project docs*, licensed under **CC BY 4.0**. See [the license](/license)."
+    snippet = "```\n" + "\n".join(f"    step_{n}()" for n in range(30)) + "\n```"
+    blocks = ["# Docs"]
+    for i in range(size):
+        blocks.extend([nav, generate_inline_text(60, i), snippet, notice])
+    return "\n\n".join(blocks)
+
+
+MIN_REGRESSION_SECONDS = 0.001
+
+CORPORA = {
+    "paragraphs": generate_paragraphs,
+    "lists": generate_lists,
+    "quotes": generate_quotes,
+    "links": generate_link_page,
+    "code": generate_code_blocks,
+    "boilerplate": generate_boilerplate,
+}
+
+
+def generate_site(root, pages, seed=0):
+    rng = random.Random(seed)
+    content = os.path.join(root, "content")
+    for i in range(pages):
+        section = os.path.join(content, f"section{i % 20}")
+        os.makedirs(section, exist_ok=True)
+        body = [generate_inline_text(rng.randint(50, 400), seed + i) for _ in range(rng.randint(2, 8))]
+        with open(os.path.join(section, f"page{i}.md"), 'w') as f:
+            f.write("\n\n".join([f"# Page {i}"] + body))
+    template = os.path.join(root, "template.html")
+    with open(template, 'w') as f:
+        f.write("<html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>")
+    return content, template
+
+
+def time_call(function, *args, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_inline(words, repeat):
+    text = generate_inline_text(words)
+    if text_to_text_nodes(text) != chained_text_to_text_nodes(text):
+        raise Exception("Single-pass scanner disagrees with the chained split_nodes_* passes")
+    chained = time_call(chained_text_to_text_nodes, text, repeat=repeat)
+    scanned = time_call(text_to_text_nodes, text, repeat=repeat)
+    print(f"inline {words} words: chained {chained * 1000:.2f}ms, "
+          f"single pass {scanned * 1000:.2f}ms ({chained / scanned:.1f}x)")
+
+
+def bench_links(links, repeat):
+    nodes = [TextNode(generate_link_text(links), TextType.TEXT)]
+    if split_nodes_link(split_nodes_image(nodes)) != rescanning_split_nodes_link(rescanning_split_nodes_image(nodes)):
+        raise Exception("Offset-based image/link splitting disagrees with the rescanning version")
+    rescanning = time_call(lambda: rescanning_split_nodes_link(rescanning_split_nodes_image(nodes)), repeat=repeat)
+    offsets = time_call(lambda: split_nodes_link(split_nodes_image(nodes)), repeat=repeat)
+    print(f"links {links} links: rescanning {rescanning * 1000:.2f}ms, "
+          f"offsets {offsets * 1000:.2f}ms ({rescanning / offsets:.1f}x)")
+
+
+def rescanning_classify_and_convert(blocks):
+    # The converters split the block again after the classifier already did
+    converters = {
+        BlockType.QUOTE: quote_block_to_htmlnode,
+        BlockType.UNORDERED_LIST: unordered_list_block_to_htmlnode,
+        BlockType.ORDERED_LIST: ordered_list_block_to_htmlnode,
+        BlockType.PARAGRAPH: paragraph_block_to_htmlnode,
+        BlockType.HEADING: heading_block_to_htmlnode,
+        BlockType.CODE: code_block_to_htmlnode,
+    }
+    return [converters[rescanning_block_to_block_type(block)](block) for block in blocks]
+
+
+def bench_classifier(name, markdown, repeat):
+    blocks = markdown_to_blocks(markdown)
+    if [block_to_block_type(block) for block in blocks] != [rescanning_block_to_block_type(block) for block in blocks]:
+        raise Exception("Single-scan classifier disagrees with the rescanning block_to_block_type")
+    rescanning = time_call(lambda: [rescanning_block_to_block_type(block) for block in blocks], repeat=repeat)
+    single = time_call(lambda: [classify_block(block) for block in blocks], repeat=repeat)
+    converted_twice = time_call(lambda: rescanning_classify_and_convert(blocks), repeat=repeat)
+    converted_once = time_call(lambda: [block_to_html_node(block) for block in blocks], repeat=repeat)
+    print(f"classify {name}: rescanning {rescanning * 1000:.2f}ms, single scan {single * 1000:.2f}ms "
+          f"({rescanning / single:.1f}x); with converters {converted_twice * 1000:.2f}ms vs "
+          f"{converted_once * 1000:.2f}ms ({converted_twice / converted_once:.1f}x)")
+
+
+def build_nodes(paragraphs):
+    return [[text_node_to_html_node(node) for node in text_to_text_nodes(paragraph)] for paragraph in paragraphs]
+
+
+def bench_nodes(words, repeat):
+    paragraphs = [generate_inline_text(100, seed) for seed in range(words // 100)]
+    elapsed = time_call(build_nodes, paragraphs, repeat=repeat)
+    tracemalloc.start()
+    nodes = build_nodes(paragraphs)
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = sum(len(children) for children in nodes)
+    print(f"nodes {words} words: {count} leaves built in {elapsed * 1000:.2f}ms, "
+          f"{size / 1024 / 1024:.1f}MiB retained ({size / count:.0f} bytes per leaf), "
+          f"{peak / 1024 / 1024:.1f}MiB peak")
+
+
+def measure(function, repeat):
+    seconds = time_call(function, repeat=repeat)
+    # Tracing slows everything down, so peak memory comes from a separate run
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def bench_corpus(name, markdown, repeat):
+    blocks = markdown_to_blocks(markdown)
+    paragraphs = [" ".join(block.split("\n")) for block in blocks
+                  if block_to_block_type(block) == BlockType.PARAGRAPH]
+    node = markdown_to_html_node(markdown)
+    return {
+        f"{name}/markdown_to_blocks": measure(lambda: markdown_to_blocks(markdown), repeat),
+        f"{name}/block_to_block_type": measure(lambda: [block_to_block_type(block) for block in blocks], repeat),
+        f"{name}/text_to_text_nodes": measure(lambda: [text_to_text_nodes(text) for text in paragraphs], repeat),
+        # Cold starts from an empty block cache every run, warm is what later pages of a build see
+        f"{name}/markdown_to_html_node": measure(lambda: (block_cache.clear(),
+                                                          markdown_to_html_node(markdown)), repeat),
+        f"{name}/markdown_to_html_node_warm": measure(lambda: markdown_to_html_node(markdown), repeat),
+        f"{name}/to_html": measure(node.to_html, repeat),
+    }
+
+
+def bench_site(pages, repeat):
+    with tempfile.TemporaryDirectory() as root:
+        content, template = generate_site(root, pages)
+        public = os.path.join(root, "public")
+
+        def build():
+            # Every repeat is a fresh build process, not one that already converted these blocks
+            block_cache.clear()
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(content, template, public)
+
+        return {f"site/{pages}_pages/generate_pages_recursive": measure(build, repeat)}
+
+
+def generate_changelog(size):
+    releases = [f"## Release {i}\n\n- fixed *thing* {i}\n- added `feature` {i}\n\n{generate_inline_text(60, i)}"
+                for i in range(size)]
+    return "\n\n".join(["# Changelog"] + releases)
+
+
+def bench_large_page(releases, repeat):
+    with tempfile.TemporaryDirectory() as root:
+        from_path = os.path.join(root, "changelog.md")
+        template = os.path.join(root, "template.html")
+        with open(from_path, 'w') as f:
+            f.write(generate_changelog(releases))
+        with open(template, 'w') as f:
+            f.write("<html><head><title>{{ Title }}</title></head><body>{{ Content }}</body></html>")
+
+        def render(function):
+            def run():
+                block_cache.clear()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    function(from_path, template, os.path.join(root, "changelog.html"))
+            return run
+
+        return {
+            f"large_page/{releases}_releases/generate_page": measure(render(generate_page), repeat),
+            f"large_page/{releases}_releases/stream_page": measure(render(stream_page), repeat),
+        }
+
+
+# Each of these builds a whole page or site per run, so they repeat at most three times
+SUITES = {
+    "large_page": lambda scale, repeat: bench_large_page(500 * scale, min(repeat, 3)),
+    "site": lambda scale, repeat: bench_site(200 * scale, min(repeat, 3)),
+}
+
+
+def selected(names, only):
+    # Corpora and suites are picked the same way, by --only being part of their name
+    return [name for name in names if not only or only in name]
+
+
+def run_suite(scale, repeat, only=None):
+    results = {}
+    for name in selected(CORPORA, only):
+        results.update(bench_corpus(name, CORPORA[name](20 * scale), repeat))
+    for name in selected(SUITES, only):
+        results.update(SUITES[name](scale, repeat))
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:60} {result['seconds'] * 1000:10.2f}ms {result['peak_bytes'] / 1024 / 1024:8.1f}MiB")
+            continue
+        change = result["seconds"] / previous["seconds"] - 1
+        memory_change = result["peak_bytes"] / max(previous["peak_bytes"], 1) - 1
+        flag = ""
+        # Sub-millisecond stages are dominated by timer noise
+        slower = change > threshold and result["seconds"] > MIN_REGRESSION_SECONDS
+        if slower or memory_change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:60} {result['seconds'] * 1000:10.2f}ms ({change:+.0%}) "
+              f"{result['peak_bytes'] / 1024 / 1024:8.1f}MiB ({memory_change:+.0%}){flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Markdown pipeline benchmarks")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, the best one is reported")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplies the size of every synthetic corpus")
+    parser.add_argument("--only", help="Only run corpora and suites whose name contains this string")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results to a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare the results against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative slowdown or memory growth reported as a regression")
+    parser.add_argument("--implementations", action="store_true",
+                        help="Also compare the optimized inline parsing against the original implementations")
+    args = parser.parse_args(argv)
+
+    if args.implementations:
+        for words in (1_000, 10_000, 100_000):
+            bench_inline(words, args.repeat)
+        for links in (100, 1_000, 10_000, 20_000):
+            bench_links(links, args.repeat)
+        for words in (10_000, 200_000):
+            bench_nodes(words, args.repeat)
+        for name in ("lists", "quotes"):
+            bench_classifier(name, CORPORA[name](200), args.repeat)
+
+    results = run_suite(args.scale, args.repeat, args.only)
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.threshold)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if regressions:
+        print(f"{len(regressions)} regressions against {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
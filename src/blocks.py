@@ -1,7 +1,27 @@
 from htmlnode import *
 from textnode import *
 import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from collections import OrderedDict
 from utility import *
+from manifest import *
+from template import *
+from profiling import *
+from assets import *
+from cache import *
+from output import *
+from siteindex import *
+from metadata import *
+from depgraph import *
+
+BLOCK_CACHE_SIZE = 4096
+# Markdown files larger than this are parsed and written a block at a time instead of being read whole
+STREAM_THRESHOLD = 16 * 1024 * 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+HEADING_CHUNK_SIZE = 4096
+HEADING_LIMIT = 64 * 1024
+ORDERED_PREFIXES = [f"{i}. " for i in range(1, 10)]
 
 
 class BlockType(Enum):
@@ -24,38 +44,72 @@ def markdown_to_blocks(markdown):
     return new_blocks
 
 
-def block_to_block_type(block):
-    if block[0] == '#' and block[:7] != '#######':
-        return BlockType.HEADING
-    elif block[:3] == '```' and block[-3:] == '```':
-        return BlockType.CODE
-    elif block[0] == '>':
-        quote = True
-        for line in block.split('\n'):
+def iter_markdown_blocks(chunks):
+    # Yields exactly what markdown_to_blocks returns, but holds only the block being read instead of the whole file
+    pieces = []
+    seen_text = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        seen_text = True
+        start = 0
+        if pieces and pieces[-1].endswith("\n") and chunk.startswith("\n"):
+            # The blank line straddles two chunks
+            pieces[-1] = pieces[-1][:-1]
+            yield "".join(pieces).strip()
+            pieces = []
+            start = 1
+        end = chunk.find("\n\n", start)
+        while end != -1:
+            pieces.append(chunk[start:end])
+            yield "".join(pieces).strip()
+            pieces = []
+            start = end + 2
+            end = chunk.find("\n\n", start)
+        if start < len(chunk):
+            pieces.append(chunk[start:])
+    if seen_text:
+        yield "".join(pieces).strip()
+
+
+def read_chunks(f, size=STREAM_CHUNK_SIZE):
+    return iter(lambda: f.read(size), "")
+
+
+def classify_block(block):
+    # One scan decides the type and hands the split lines on to the converter, so nothing splits the block twice
+    first = block[0]
+    if first == '#' and block[:7] != '#######':
+        return BlockType.HEADING, None
+    if block[:3] == '```' and block[-3:] == '```':
+        return BlockType.CODE, None
+    if first == '>':
+        lines = block.split('\n')
+        for line in lines:
             if line[0] != '>':
-                quote = False
-                break
-        if quote:
-            return BlockType.QUOTE
-    elif block[:2] == '* ' or block[:2] == '- ':
-        unordered = True
-        for line in block.split('\n'):
-            if line[:2] != '* ' and line[:2] != '- ':
-                unordered = False
-                break
-        if unordered:
-            return BlockType.UNORDERED_LIST
-    elif block[:3] == '1. ':
-        ordered = True
-        i = 1
-        for line in block.split('\n'):
-            if line[:3] != f'{i}. ':
-                ordered = False
-                break
-            i += 1
-        if ordered:
-            return BlockType.ORDERED_LIST
-    return BlockType.PARAGRAPH
+                return BlockType.PARAGRAPH, lines
+        return BlockType.QUOTE, lines
+    if (first == '*' or first == '-') and block[1:2] == ' ':
+        lines = block.split('\n')
+        for line in lines:
+            prefix = line[:2]
+            if prefix != '* ' and prefix != '- ':
+                return BlockType.PARAGRAPH, lines
+        return BlockType.UNORDERED_LIST, lines
+    if block[:3] == '1. ':
+        lines = block.split('\n')
+        # Item numbers are compared three characters at a time, so lists longer than nine items stay paragraphs
+        if len(lines) > len(ORDERED_PREFIXES):
+            return BlockType.PARAGRAPH, lines
+        for line, prefix in zip(lines, ORDERED_PREFIXES):
+            if line[:3] != prefix:
+                return BlockType.PARAGRAPH, lines
+        return BlockType.ORDERED_LIST, lines
+    return BlockType.PARAGRAPH, None
+
+
+def block_to_block_type(block):
+    return classify_block(block)[0]
 
 
 def text_to_children(text):
@@ -67,9 +121,9 @@ def text_to_children(text):
     return children
 
 
-def quote_block_to_htmlnode(block):
+def quote_block_to_htmlnode(block, lines=None):
     new_block = []
-    for line in block.split('\n'):
+    for line in lines if lines is not None else block.split('\n'):
         line = line.lstrip('>').lstrip()
         if line:
             new_block.append(line)
@@ -96,78 +150,556 @@ def code_block_to_htmlnode(block):
     return ParentNode("pre", [code])
 
 
-def unordered_list_block_to_htmlnode(block):
+def unordered_list_block_to_htmlnode(block, lines=None):
     children = []
-    for line in block.split("\n"):
+    for line in lines if lines is not None else block.split("\n"):
         text = line[2:]
         inline_children = text_to_children(text)
         children.append(ParentNode("li", inline_children))
     return ParentNode("ul", children)
 
 
-def ordered_list_block_to_htmlnode(block):
+def ordered_list_block_to_htmlnode(block, lines=None):
     children = []
-    for line in block.split("\n"):
+    for line in lines if lines is not None else block.split("\n"):
         text = line[3:]
         inline_children = text_to_children(text)
         children.append(ParentNode("li", inline_children))
     return ParentNode("ol", children)
 
 
-def paragraph_block_to_htmlnode(block):
-    lines = block.split("\n")
-    paragraph = " ".join(lines)
+def paragraph_block_to_htmlnode(block, lines=None):
+    paragraph = " ".join(lines if lines is not None else block.split("\n"))
     children = text_to_children(paragraph)
     return ParentNode("p", children)
 
 
 def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-    nodes = []
-    for block in blocks:
-        match block_to_block_type(block):
-            case BlockType.QUOTE:
-                nodes.append(quote_block_to_htmlnode(block))
-            case BlockType.HEADING:
-                nodes.append(heading_block_to_htmlnode(block))
-            case BlockType.CODE:
-                nodes.append(code_block_to_htmlnode(block))
-            case BlockType.UNORDERED_LIST:
-                nodes.append(unordered_list_block_to_htmlnode(block))
-            case BlockType.ORDERED_LIST:
-                nodes.append(ordered_list_block_to_htmlnode(block))
-            case BlockType.PARAGRAPH:
-                nodes.append(paragraph_block_to_htmlnode(block))
-    return ParentNode("div", nodes)
-
-
-def generate_page(from_path, template_path, dest_path):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    markdown = open(from_path).read()
-    template = open(template_path).read()
-    content = markdown_to_html_node(markdown).to_html()
-    title = extract_title(markdown)
-    page = template.replace("{{ Title }}", title).replace("{{ Content }}", content)
-    dest_path_dir = os.path.dirname(dest_path)
-    if not os.path.exists(dest_path_dir):
-        os.mkdir(dest_path_dir)
-    open(dest_path, 'w').write(page)
-
-
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path):
-    for element in os.listdir(dir_path_content):
+    return blocks_to_html_node(markdown_to_blocks(markdown))
+
+
+def block_to_html_node(block):
+    block_type, lines = classify_block(block)
+    match block_type:
+        case BlockType.QUOTE:
+            return quote_block_to_htmlnode(block, lines)
+        case BlockType.HEADING:
+            return heading_block_to_htmlnode(block)
+        case BlockType.CODE:
+            return code_block_to_htmlnode(block)
+        case BlockType.UNORDERED_LIST:
+            return unordered_list_block_to_htmlnode(block, lines)
+        case BlockType.ORDERED_LIST:
+            return ordered_list_block_to_htmlnode(block, lines)
+        case BlockType.PARAGRAPH:
+            return paragraph_block_to_htmlnode(block, lines)
+
+
+class BlockCache:
+    # Boilerplate shared across pages (notices, nav lists, snippets) is converted once per process,
+    # which is safe because nothing mutates a node after it is built
+    def __init__(self, max_entries=BLOCK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.seen = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def convert(self, block):
+        node = self.entries.get(block)
+        if node is not None:
+            self.entries.move_to_end(block)
+            self.hits += 1
+            return node
+        self.misses += 1
+        node = block_to_html_node(block)
+        # Only blocks seen a second time are kept, so a site of unique pages doesn't fill memory with one-off trees
+        key = hash(block)
+        if key in self.seen:
+            del self.seen[key]
+            self.entries[block] = node
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.seen[key] = None
+            if len(self.seen) > self.max_entries * 4:
+                self.seen.popitem(last=False)
+        return node
+
+    def clear(self):
+        self.entries.clear()
+        self.seen.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+block_cache = BlockCache()
+
+
+def blocks_to_html_node(blocks):
+    return ParentNode("div", [block_cache.convert(block) for block in blocks])
+
+
+class StreamedContent:
+    # Stands in for the content node, converting and writing one block at a time
+    __slots__ = ("blocks", "assets", "text", "links")
+
+    def __init__(self, blocks, assets=None, text=None, links=None):
+        self.blocks = blocks
+        self.assets = assets
+        self.text = text
+        self.links = links
+
+    def write_html(self, write):
+        write("<div>")
+        for block in self.blocks:
+            if self.links is not None:
+                self.links.update(page_links(block))
+            node = block_cache.convert(block)
+            if self.assets:
+                node = rewrite_asset_urls(node, self.assets)
+            if self.text is not None:
+                self.text.add_node(node)
+            node.write_html(write)
+        write("</div>")
+
+
+def read_heading(f, first_line=False):
+    # Reads only as far as the title goes, the text between the first two '#' just like extract_title. The metadata
+    # index keeps only the first line so it stops there, and a title still running after HEADING_LIMIT characters is
+    # cut to its first line rather than reading a huge page whole
+    if f.read(1) != '#':
+        raise Exception("No h1 header in markdown")
+    pieces = []
+    size = 0
+    for chunk in read_chunks(f, HEADING_CHUNK_SIZE):
+        end = chunk.find('#')
+        if first_line:
+            newline = chunk.find('\n')
+            if newline != -1 and (end == -1 or newline < end):
+                end = newline
+        if end != -1:
+            pieces.append(chunk[:end])
+            break
+        pieces.append(chunk)
+        size += len(chunk)
+        if size >= HEADING_LIMIT:
+            return "".join(pieces).split('\n', 1)[0]
+    return "".join(pieces)
+
+
+def read_page_record(path, stat):
+    # What the metadata index keeps about a page: its frontmatter and title, read without the rest of the page
+    with open(path) as f:
+        meta = read_frontmatter(f)
+        title = short_title(meta["title"] if "title" in meta else read_heading(f, first_line=True))
+    return {"stat": [stat.st_mtime_ns, stat.st_size], "title": title, "meta": meta}
+
+
+def build_page_index(sources, previous=None):
+    # Pages whose size and mtime match the last build keep their record without being opened
+    previous = previous or {}
+    records = {}
+    for source in sources:
+        stat = os.stat(source)
+        record = previous.get(source)
+        if record is None or record["stat"] != [stat.st_mtime_ns, stat.st_size]:
+            try:
+                record = read_page_record(source, stat)
+            except Exception:
+                # Left out of the index, rendering the page reports what's wrong with it
+                continue
+        records[source] = record
+    return records
+
+
+def stream_page(from_path, template_path, dest_path, variables=None, minify=False, assets=None, fsync=False,
+                site_index=False):
+    text = PageText() if site_index else None
+    template = load_template(template_path, minify, assets)
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    with open(from_path) as f:
+        meta = read_frontmatter(f)
+        values = template_values(variables, meta)
+        if "title" not in meta:
+            body = f.tell()
+            values["Title"] = read_heading(f)
+            f.seek(body)
+        links = set()
+        values["Content"] = StreamedContent(iter_markdown_blocks(read_chunks(f)), assets, text, links)
+        stream_output(dest_path, partial(write_template, template, values), fsync)
+    return page_record(values["Title"], links, text)
+
+
+def page_record(title, links, text=None):
+    # What a render adds to the page's manifest entry: its outgoing links and, with the site index, its text
+    record = text.entry(title) if text is not None else {}
+    record["links"] = sorted(links)
+    return record
+
+
+def generate_page(from_path, template_path, dest_path, variables=None, profile=None, minify=False, assets=None,
+                  cache_dir=None, source_hash=None, fsync=False, writer=None, site_index=False):
+    log(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    profiling = profile is not None
+    if not profiling:
+        if os.path.getsize(from_path) > STREAM_THRESHOLD:
+            # Huge pages skip the content cache too, keeping a copy of their HTML would cost as much as the page
+            return stream_page(from_path, template_path, dest_path, variables, minify, assets, fsync, site_index)
+        profile = NO_PROFILE
+    with profile.stage("read", from_path):
+        with open(from_path) as f:
+            meta, markdown = split_frontmatter(f.read())
+        template = load_template(template_path, minify, assets)
+        links = page_links(markdown)
+    content = None
+    # The search index, sitemap and feed are fed from this pass instead of re-reading the written HTML
+    text = PageText() if site_index else None
+    if cache_dir is not None:
+        with profile.stage("content_cache", from_path):
+            cache_key = content_cache_key(source_hash or hash_file(from_path), page_assets(links, assets))
+            content = read_cached_content(cache_dir, cache_key)
+    if content is None:
+        with profile.stage("markdown_to_blocks", from_path):
+            blocks = markdown_to_blocks(markdown)
+        hits, misses = block_cache.hits, block_cache.misses
+        with profile.stage("markdown_to_html_node", from_path):
+            content = blocks_to_html_node(blocks)
+        profile.count("block_cache_hits", block_cache.hits - hits)
+        profile.count("block_cache_misses", block_cache.misses - misses)
+        if assets:
+            with profile.stage("asset_urls", from_path):
+                content = rewrite_asset_urls(content, assets)
+        if text is not None:
+            with profile.stage("site_index", from_path):
+                text.add_content(content)
+        if cache_dir is not None:
+            # A template-only change later reuses this HTML instead of parsing the markdown again
+            with profile.stage("to_html", from_path):
+                content = content.to_html()
+            with profile.stage("content_cache", from_path):
+                write_cached_content(cache_dir, cache_key, content)
+    elif text is not None:
+        with profile.stage("site_index", from_path):
+            text.add_content(content)
+    values = template_values(variables, meta)
+    if "title" not in meta:
+        values["Title"] = extract_title(markdown)
+    entry = page_record(values["Title"], links, text)
+    if not profiling:
+        values["Content"] = content
+        # Serializing, filling the template and writing are one streaming pass, on a writer thread when there is one
+        fill = partial(write_template, template, values)
+        if writer is not None:
+            writer.submit(dest_path, fill)
+        else:
+            stream_output(dest_path, fill, fsync)
+        return entry
+    # Profiling splits serializing, filling the template and writing apart to time each of them
+    if not isinstance(content, str):
+        with profile.stage("to_html", from_path):
+            content = content.to_html()
+    values["Content"] = content
+    with profile.stage("template", from_path):
+        page = render_template(template, values)
+    with profile.stage("write", from_path):
+        write_output(dest_path, page, fsync)
+    return entry
+
+
+def page_output_path(from_path, dir_path_content, dest_dir_path):
+    return os.path.join(dest_dir_path, os.path.relpath(from_path, dir_path_content))[:-3] + '.html'
+
+
+def find_pages(dir_path_content, dest_dir_path):
+    pages = []
+    for element in sorted(os.listdir(dir_path_content)):
         path = os.path.join(dir_path_content, element)
         dest_dir = os.path.join(dest_dir_path, element)
-        print(f"current element: {path}\n"
-              f"It's a file: {os.path.isfile(path)}\n"
-              f"{path[-3:]} ends on '.md': {path[-3:] == '.md'}\n"
-              f"It's a directory: {os.path.isdir(path)}")
-        print(f"dest_dir_path: {dest_dir_path}, path: {path}, dest_dir: {dest_dir}")
+        log(f"current element: {path}\n"
+            f"It's a file: {os.path.isfile(path)}\n"
+            f"{path[-3:]} ends on '.md': {path[-3:] == '.md'}\n"
+            f"It's a directory: {os.path.isdir(path)}")
+        log(f"dest_dir_path: {dest_dir_path}, path: {path}, dest_dir: {dest_dir}")
         if os.path.isfile(path):
             if path[-3:] == '.md':
-                dest_dir = os.path.join(dest_dir_path, element).replace('.md', '.html')
-                generate_page(path, template_path, dest_dir)
+                pages.append((path, os.path.join(dest_dir_path, element[:-3] + '.html')))
+        elif os.path.isdir(path):
+            pages.extend(find_pages(path, dest_dir))
+    return pages
+
+
+def render_page(job, writer=None):
+    from_path, template_path, dest_path, source_hash, variables, profiling, options = job
+    profile = BuildProfile() if profiling else None
+    try:
+        entry = generate_page(from_path, template_path, dest_path, variables, profile=profile,
+                              source_hash=source_hash, writer=writer, **options)
+    except Exception as e:
+        return from_path, f"{type(e).__name__}: {e}", None, None
+    return from_path, None, (profile.pages, profile.counters) if profiling else None, entry
+
+
+def render_pages(pages, n_jobs=1, profile=None, hashes=None, variables=None, **options):
+    # Pages are rendered independently, so one failure is reported alongside the others instead of aborting the build
+    hashes = hashes or {}
+    variables = variables or {}
+    jobs = [(from_path, template_path, dest_path, hashes.get(from_path), variables.get(from_path),
+             profile is not None, options)
+            for from_path, template_path, dest_path in pages]
+    progress = Progress(len(jobs))
+    results = []
+    if n_jobs > 1 and len(jobs) > 1:
+        chunksize = max(1, len(jobs) // (n_jobs * 4))
+        # Workers write their own pages, they only need to know how much to say about it
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=set_log_mode,
+                                 initargs=(get_log_mode(),)) as executor:
+            for result in executor.map(render_page, jobs, chunksize=chunksize):
+                results.append(result)
+                progress.update()
+    else:
+        # Writes go to a few threads so the next page renders while the last one is still being written
+        writer = OutputWriter(fsync=options.get("fsync", False))
+        try:
+            for job in jobs:
+                results.append(render_page(job, writer))
+                progress.update()
+        finally:
+            _, write_errors = writer.close()
+        sources = {dest_path: from_path for from_path, _, dest_path in pages}
+        results.extend((sources[dest_path], error, None, None) for dest_path, error in write_errors.items())
+    progress.finish()
+    errors = []
+    entries = {}
+    for from_path, error, timings, entry in results:
+        if error is not None:
+            errors.append((from_path, error))
+            continue
+        if entry is not None:
+            entries[from_path] = entry
+        if profile is not None:
+            profile.merge_pages(timings[0])
+            profile.merge_counters(timings[1])
+    return errors, entries
+
+
+def template_assets(template_path, assets):
+    with open(template_path) as f:
+        return page_assets(referenced_urls(f.read()), assets)
+
+
+def find_changed_pages(pages, manifest, dest_dir_path, minify=False, assets=None, site_index=False,
+                       variables=None, search_terms=None):
+    pending = []
+    entries = {}
+    reasons = {}
+    template_hashes = {}
+    # Switching minification or the site index on or off has to rebuild every page, just like a template edit
+    variant = ("-minified" if minify else "") + ("-indexed" if site_index else "")
+    for from_path, page_template, dest_path in pages:
+        if page_template not in template_hashes:
+            # A template only pulls in the pages using it when one of the assets it references is renamed
+            used = template_assets(page_template, assets)
+            template_hashes[page_template] = (hash_file(page_template) + variant
+                                              + (f"-assets-{assets_digest(used)}" if used else ""))
+        source_hash = hash_file(from_path)
+        output = os.path.relpath(dest_path, dest_dir_path)
+        entry = manifest["pages"].get(from_path)
+        # Cross-page data, like a list page's entries, changes the page without touching its source
+        digest = variables_digest((variables or {}).get(from_path))
+        current_assets = {}
+        if assets and entry is not None:
+            current_assets = page_assets(entry["links"], assets) if "links" in entry else None
+        page_reasons = page_rebuild_reasons(entry, source_hash, template_hashes[page_template], output,
+                                            dest_dir_path, digest, current_assets)
+        if search_terms is not None and from_path not in search_terms.pages:
+            page_reasons.append("search terms missing")
+        if not page_reasons:
+            continue
+        pending.append((from_path, page_template, dest_path))
+        reasons[from_path] = page_reasons
+        entries[from_path] = {"source": source_hash, "template": template_hashes[page_template], "output": output}
+        if digest:
+            entries[from_path]["variables"] = digest
+    return pending, entries, reasons
+
+
+def explain_rebuilds(pending, reasons, manifest):
+    graph = dependency_graph(manifest)
+    records = manifest.get("metadata", {})
+    tagged = build_tag_map(records)
+    rebuilt = {from_path for from_path, _, _ in pending}
+    for from_path, _, _ in pending:
+        print(f"{from_path}: {'; '.join(reasons[from_path])}")
+        # Shows how far an edit fans out, a dependent only re-renders when its own output would change. Pages
+        # sharing a tag rank this one in their related lists
+        used_by = set(depends_on(graph, from_path))
+        if from_path in records:
+            used_by.update(tag_mates(records, tagged, from_path))
+        dependents = [f"{path} ({'rebuilt' if path in rebuilt else 'unchanged'})" for path in sorted(used_by)]
+        if dependents:
+            print(f"  depended on by {', '.join(dependents)}")
+
+
+def report_minified(pages, assets=None):
+    saved = sum(minified_savings(template_path, assets) for _, template_path, _ in pages)
+    info(f"Minified {len(pages)} pages, saving {saved / 1024:.1f}KiB")
+
+
+def generate_pages(pages, dest_dir_path, manifest=None, jobs=1, profile=None, minify=False, assets=None,
+                   cache_dir=None, fsync=False, site_index=False, variables=None, explain=False, search_terms=None):
+    if manifest is None:
+        pending, entries = pages, {}
+    else:
+        with (profile if profile is not None else NO_PROFILE).stage("hash"):
+            pending, entries, reasons = find_changed_pages(pages, manifest, dest_dir_path, minify, assets,
+                                                           site_index, variables, search_terms)
+        if explain:
+            explain_rebuilds(pending, reasons, manifest)
+
+    hashes = {from_path: entry["source"] for from_path, entry in entries.items()}
+    make_dirs(dest_path for _, _, dest_path in pending)
+    errors, rendered = render_pages(pending, jobs, profile, hashes, variables, minify=minify, assets=assets,
+                                   cache_dir=cache_dir, fsync=fsync, site_index=site_index)
+    failed = {from_path for from_path, _ in errors}
+    if manifest is not None:
+        for from_path, entry in entries.items():
+            if from_path in failed:
+                continue
+            # Unchanged pages keep their links, title and summary from the build that rendered them
+            entry = dict(entry, **rendered.get(from_path, {}))
+            terms = entry.pop("terms", None)
+            if terms is not None and search_terms is not None:
+                search_terms.update(from_path, terms)
+            used = page_assets(entry.get("links", ()), assets)
+            if used:
+                entry["assets"] = used
+            manifest["pages"][from_path] = entry
+    generated = [page for page in pending if page[0] not in failed]
+    if minify:
+        report_minified(generated, assets)
+    return [dest_path for _, _, dest_path in generated], errors
+
+
+def remove_outputs(dest_dir_path, outputs):
+    removed = []
+    for output in outputs:
+        path = os.path.join(dest_dir_path, output)
+        if os.path.isfile(path):
+            removed.append(path)
+        # Precompressed siblings go with the file, and directories left empty go too
+        for variant in [path] + [path + suffix for suffix in COMPRESSED_SUFFIXES]:
+            if os.path.isfile(variant):
+                os.remove(variant)
+        directory = os.path.dirname(path)
+        while (os.path.normpath(directory) != os.path.normpath(dest_dir_path) and os.path.isdir(directory)
+               and not os.listdir(directory)):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
+    return removed
+
+
+def remove_stale_pages(manifest, sources, dest_dir_path):
+    stale = [source for source in manifest["pages"] if source not in sources]
+    return remove_outputs(dest_dir_path, [manifest["pages"].pop(source)["output"] for source in stale])
+
+
+def record_depends(manifest, depends):
+    # Kept for every page, a new section member can join a list page's inputs without changing what it shows
+    for source, entry in manifest["pages"].items():
+        if depends.get(source):
+            entry["depends"] = depends[source]
         else:
-            dest_dir = os.path.join(dest_dir_path, element)
-            if os.path.isdir(path):
-                generate_pages_recursive(path, template_path, dest_dir)
+            entry.pop("depends", None)
+
+
+def index_pages(pages, dir_path_content, dest_dir_path, manifest=None):
+    previous = manifest.get("metadata") if manifest is not None else None
+    records = build_page_index([from_path for from_path, _, _ in pages], previous)
+    if manifest is not None:
+        manifest["metadata"] = records
+    outputs = {from_path: os.path.relpath(dest_path, dest_dir_path) for from_path, _, dest_path in pages}
+    digests = manifest.setdefault("tag_digests", {}) if manifest is not None else None
+    variables, depends = page_variables(records, outputs, dir_path_content, digests)
+    return records, outputs, variables, depends
+
+
+def generate_tag_pages(records, outputs, template_path, dest_dir_path, manifest=None, minify=False, assets=None,
+                       fsync=False):
+    # Tag pages come straight from the index, none of the tagged pages is opened again
+    tagged = build_tag_map(records)
+    slugs = tag_slugs(tagged)
+    template = load_template(template_path, minify, assets)
+    written = []
+    for tag, sources in sorted(tagged.items()):
+        output = tag_output(slugs[tag])
+        page = render_template(template, {"Title": f"Tagged {tag}", "Tags": "", "Related": "", "Pages": "",
+                                          "Content": page_list(records, outputs, newest_first(records, sources))})
+        write_output(os.path.join(dest_dir_path, output), page, fsync)
+        written.append(output)
+    if manifest is not None:
+        remove_outputs(dest_dir_path, set(manifest.pop("tags", ())) - set(written))
+        if written:
+            manifest["tags"] = written
+    return written
+
+
+def update_site_indexes(manifest, dest_dir_path, site_index=False, base_url=None, search_terms=None):
+    # Returns the index files that were written, unchanged ones are left alone and not counted
+    outputs = []
+    written = []
+    if site_index:
+        for source in [source for source in search_terms.pages if source not in manifest["pages"]]:
+            search_terms.remove(source)
+        pages = [dict(entry, source_path=source) for source, entry in manifest["pages"].items()]
+        outputs, written = write_site_indexes(dest_dir_path, pages, search_terms, base_url)
+        manifest["search_terms"] = search_terms.token
+    else:
+        manifest.pop("search_terms", None)
+    # Shards whose terms all disappeared would otherwise answer lookups with stale page numbers, and indexes that
+    # are switched off, like the sitemap once --base-url is dropped, go away. Files this build didn't write are kept
+    remove_outputs(dest_dir_path, set(manifest.pop("indexes", ())) - set(outputs))
+    if outputs:
+        manifest["indexes"] = outputs
+    return written
+
+
+def raise_page_errors(errors, total):
+    if errors:
+        details = "\n".join(f"  {from_path}: {error}" for from_path, error in errors)
+        raise Exception(f"Failed to generate {len(errors)} of {total} pages:\n{details}")
+
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, manifest=None, jobs=1, profile=None,
+                             minify=False, assets=None, cache_dir=None, fsync=False, site_index=False,
+                             base_url=None, explain=False, search_terms=None):
+    clear_template_cache()
+    indexing = site_index or bool(base_url)
+    if manifest is None and indexing:
+        # The indexes are written from manifest entries, a throwaway manifest still renders every page
+        manifest = {"pages": {}}
+    if indexing:
+        if search_terms is None:
+            search_terms = SearchTerms()
+        elif manifest.get("search_terms") != search_terms.token:
+            # Saved alongside a different manifest, e.g. before a rollback, its terms can't be trusted
+            search_terms.reset()
+    with (profile if profile is not None else NO_PROFILE).stage("discover"):
+        pages = [(from_path, find_template(from_path, dir_path_content, template_path), dest_path)
+                 for from_path, dest_path in find_pages(dir_path_content, dest_dir_path)]
+        records, outputs, variables, depends = index_pages(pages, dir_path_content, dest_dir_path, manifest)
+    generated, errors = generate_pages(pages, dest_dir_path, manifest, jobs, profile, minify, assets, cache_dir,
+                                       fsync, indexing, variables, explain, search_terms)
+    with (profile if profile is not None else NO_PROFILE).stage("tag_pages"):
+        generate_tag_pages(records, outputs, template_path, dest_dir_path, manifest, minify, assets, fsync)
+    if manifest is not None:
+        remove_stale_pages(manifest, {from_path for from_path, _, _ in pages}, dest_dir_path)
+        record_depends(manifest, depends)
+        with (profile if profile is not None else NO_PROFILE).stage("site_index"):
+            update_site_indexes(manifest, dest_dir_path, indexing, base_url, search_terms)
+        if cache_dir is not None:
+            prune_content_cache(cache_dir, {content_cache_key(entry["source"],
+                                                              page_assets(entry.get("links", ()), assets))
+                                            for entry in manifest["pages"].values()})
+    raise_page_errors(errors, len(generated) + len(errors))
+    return generated
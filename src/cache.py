@@ -0,0 +1,47 @@
+import hashlib
+import os
+
+from assets import assets_digest
+from utility import atomic_write
+
+CONTENT_CACHE_DIR = ".build-cache"
+# Bump whenever a change to the markdown parser or the node serializer changes the HTML it produces
+PARSER_VERSION = "1"
+
+
+def content_cache_key(source_hash, assets=None):
+    key = f"{PARSER_VERSION}\0{assets_digest(assets)}\0{source_hash}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def content_cache_path(cache_dir, key):
+    return os.path.join(cache_dir, "content", key[:2], f"{key}.html")
+
+
+def read_cached_content(cache_dir, key):
+    try:
+        with open(content_cache_path(cache_dir, key)) as f:
+            return f.read()
+    except (FileNotFoundError, UnicodeDecodeError):
+        return None
+
+
+def write_cached_content(cache_dir, key, html):
+    path = content_cache_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Pages with identical markdown share an entry and may be written by two workers at once
+    with atomic_write(path, suffix=f".{os.getpid()}.tmp") as f:
+        f.write(html)
+
+
+def prune_content_cache(cache_dir, keep):
+    removed = []
+    root = os.path.join(cache_dir, "content")
+    for dir_path, _, file_names in os.walk(root, topdown=False):
+        for name in file_names:
+            if name[:-len(".html")] not in keep:
+                os.remove(os.path.join(dir_path, name))
+                removed.append(os.path.join(dir_path, name))
+        if dir_path != root and not os.listdir(dir_path):
+            os.rmdir(dir_path)
+    return removed
@@ -0,0 +1,91 @@
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from utility import atomic_write, COMPRESSED_SUFFIXES
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".json", ".xml", ".svg", ".txt"}
+MIN_COMPRESS_SIZE = 256
+
+
+def available_encodings():
+    # gzip is always there, brotli and zstd only when their packages are installed
+    encodings = [(".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encodings.append((".br", lambda data: brotli.compress(data, quality=11)))
+    if zstandard is not None:
+        encodings.append((".zst", lambda data: zstandard.ZstdCompressor(level=19).compress(data)))
+    return encodings
+
+
+def sibling_is_current(path, stat):
+    try:
+        return os.stat(path).st_mtime_ns == stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def compress_file(path, encodings):
+    stat = os.stat(path)
+    if stat.st_size < MIN_COMPRESS_SIZE:
+        return [], 0
+    data = None
+    written = []
+    saved = 0
+    for suffix, compress in encodings:
+        sibling = path + suffix
+        if sibling_is_current(sibling, stat):
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        compressed = compress(data)
+        if len(compressed) >= len(data):
+            if os.path.exists(sibling):
+                os.remove(sibling)
+            continue
+        with atomic_write(sibling, 'wb') as f:
+            f.write(compressed)
+        # The sibling carries the source's mtime, which is how later builds and the server know it is current
+        os.utime(sibling, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        written.append(sibling)
+        saved += len(data) - len(compressed)
+    return written, saved
+
+
+def find_compressible(dest_dir):
+    files = []
+    orphans = []
+    for dir_path, _, file_names in os.walk(dest_dir):
+        names = set(file_names)
+        for name in file_names:
+            base, extension = os.path.splitext(name)
+            # Only a compressed copy of a file type we compress is ours, a static archive.tar.gz is left alone
+            if extension in COMPRESSED_SUFFIXES and os.path.splitext(base)[1] in COMPRESSIBLE_EXTENSIONS:
+                if base not in names:
+                    orphans.append(os.path.join(dir_path, name))
+            elif extension in COMPRESSIBLE_EXTENSIONS:
+                files.append(os.path.join(dir_path, name))
+    return sorted(files), orphans
+
+
+def compress_outputs(dest_dir, jobs=1):
+    files, orphans = find_compressible(dest_dir)
+    for orphan in orphans:
+        os.remove(orphan)
+    encodings = available_encodings()
+    # zlib, brotli and zstd release the GIL while compressing, so threads are enough
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        results = list(executor.map(lambda path: compress_file(path, encodings), files))
+    written = [sibling for siblings, _ in results for sibling in siblings]
+    return written, sum(saved for _, saved in results)
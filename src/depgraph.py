@@ -0,0 +1,71 @@
+import posixpath
+import re
+
+from assets import URL_ATTRIBUTE_RE
+from siteindex import page_url
+from utility import extract_markdown_images, extract_markdown_links
+
+SCHEME_RE = re.compile(r"[a-zA-Z][a-zA-Z0-9+.-]*:")
+
+
+def internal_url(url):
+    url = url.strip()
+    if not url or url.startswith(("#", "//")) or SCHEME_RE.match(url):
+        return None
+    return url
+
+
+def page_links(markdown):
+    # The URLs split_nodes_link and split_nodes_image will turn into href and src, before any fingerprinting
+    links = set()
+    for _, url in extract_markdown_links(markdown) + extract_markdown_images(markdown):
+        url = internal_url(url)
+        if url is not None:
+            links.add(url)
+    return links
+
+
+def referenced_urls(text):
+    return {match.group(3) for match in URL_ATTRIBUTE_RE.finditer(text)}
+
+
+def page_assets(links, assets):
+    # Only the fingerprints a page actually references, so renaming one asset leaves the other pages alone
+    if not assets:
+        return {}
+    used = {}
+    for url in links:
+        path = url.partition("?")[0].partition("#")[0]
+        if path in assets:
+            used[path] = assets[path]
+    return used
+
+
+def link_key(url, from_url):
+    path = url.partition("?")[0].partition("#")[0]
+    resolved = posixpath.normpath(posixpath.join(posixpath.dirname(from_url), path))
+    # /majesty, /majesty/ and /majesty/index.html are the same page
+    if resolved.endswith("/index.html"):
+        resolved = resolved[:-len("index.html")]
+    return resolved.rstrip("/") or "/"
+
+
+def dependency_graph(manifest):
+    # Edges point from what a page uses to the page: linked pages, pages feeding its lists, and assets
+    pages = manifest["pages"]
+    by_url = {link_key(page_url(entry["output"]), "/"): source for source, entry in pages.items()}
+    dependents = {}
+    for source, entry in pages.items():
+        from_url = page_url(entry["output"])
+        for url in entry.get("links", ()):
+            key = link_key(url, from_url)
+            target = by_url.get(key)
+            if target != source:
+                dependents.setdefault(target if target is not None else key, set()).add(source)
+        for other in entry.get("depends", ()):
+            dependents.setdefault(other, set()).add(source)
+    return dependents
+
+
+def depends_on(graph, target):
+    return sorted(graph.get(target, ()))
@@ -1,26 +1,41 @@
+from types import MappingProxyType
+
+# Shared by every node created without props, read-only so one node can't leak attributes into the others
+EMPTY_PROPS = MappingProxyType({})
+
+
 class HTMLNode:
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag
         self.value = value
         self.children = children
-        self.props = props if props is not None else {}
+        self.props = props if props is not None else EMPTY_PROPS
 
     def to_html(self):
         raise NotImplementedError
 
+    def write_html(self, write):
+        write(self.to_html())
+
     def props_to_html(self):
-        result = ""
-        for k, v in self.props.items():
-            result += f' {k}="{v}"'
-        return result
+        if not self.props:
+            return ""
+        return "".join(f' {k}="{v}"' for k, v in self.props.items())
 
     def __repr__(self):
         return f"HTMLNode({self.tag}, {self.value}, {self.children}, {self.props})"
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, value, tag=None, props=None):
-        super().__init__(tag, value, None, props)
+        self.tag = tag
+        self.value = value
+        self.children = None
+        self.props = props if props is not None else EMPTY_PROPS
 
     def to_html(self):
         if self.value == None:
@@ -32,16 +47,27 @@ class LeafNode(HTMLNode):
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag, None, children, props)
+        self.tag = tag
+        self.value = None
+        self.children = children
+        self.props = props if props is not None else EMPTY_PROPS
 
     def to_html(self):
+        chunks = []
+        self.write_html(chunks.append)
+        return "".join(chunks)
+
+    def write_html(self, write):
+        # Children write straight into the sink, so nested markup is never concatenated into intermediate strings
         if self.tag == None:
             raise ValueError("Tag cannot be None")
         if not self.children:
             raise ValueError("ParentNode has no children")
 
-        html_string = f"<{self.tag}{self.props_to_html()}>"
+        write(f"<{self.tag}{self.props_to_html()}>")
         for child in self.children:
-            html_string += child.to_html()
-        return f"{html_string}</{self.tag}>"
+            child.write_html(write)
+        write(f"</{self.tag}>")
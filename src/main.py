@@ -1,13 +1,192 @@
+import argparse
+
 from textnode import TextNode
 from utility import *
 from blocks import *
+from manifest import *
+from profiling import *
+from watch import watch
+from compress import compress_outputs
+from staging import *
+from output import *
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Static site generator")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=1,
+        help="Number of processes used to render pages (0 uses every core)"
+    )
+    parser.add_argument(
+        "--link", choices=sorted(LINK_MODES), default="copy",
+        help="How changed static files are placed in the output directory"
+    )
+    parser.add_argument(
+        "--checksum", action="store_true",
+        help="Compare static files by content hash instead of size and mtime"
+    )
+    parser.add_argument(
+        "--clean", action="store_true",
+        help="Wipe the output directory and rebuild everything from scratch"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Record wall time per build stage and per page and print a summary"
+    )
+    parser.add_argument(
+        "--profile-json", metavar="PATH",
+        help="Also write the profile as JSON (implies --profile)"
+    )
+    parser.add_argument(
+        "--slowest", type=int, default=10,
+        help="Number of slowest pages listed in the profile"
+    )
+    parser.add_argument(
+        "--fingerprint", action="store_true",
+        help="Publish static files under content-hashed names and rewrite the URLs pointing at them"
+    )
+    parser.add_argument(
+        "--minify", action="store_true",
+        help="Strip comments and insignificant whitespace from the templates, <pre>/<code> content is left alone"
+    )
+    parser.add_argument(
+        "--no-content-cache", action="store_true",
+        help=f"Parse every rebuilt page from scratch instead of reusing the HTML cached in {CONTENT_CACHE_DIR}"
+    )
+    parser.add_argument(
+        "--compress", action="store_true",
+        help="Write .gz (and .br/.zst when available) siblings for compressible outputs"
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="Keep running and rebuild the affected pages and assets whenever sources change"
+    )
+    parser.add_argument(
+        "--port", type=int, default=None,
+        help="With --watch, also serve the output directory on this port"
+    )
+    parser.add_argument(
+        "--staged", action="store_true",
+        help=f"Build into a new directory under {BUILDS_DIR}, reusing unchanged files from the live build through "
+             "hard links, and switch public over to it only once the build succeeded"
+    )
+    parser.add_argument(
+        "--keep-builds", type=int, default=KEEP_BUILDS,
+        help="With --staged, how many builds are kept around for --rollback"
+    )
+    parser.add_argument(
+        "--rollback", action="store_true",
+        help="Point public back at the build before the current one and exit"
+    )
+    parser.add_argument(
+        "--site-index", action="store_true",
+        help="Write a sharded search index under search/ from the pages as they are rendered"
+    )
+    parser.add_argument(
+        "--base-url", default=None,
+        help="Absolute URL the site is served from, also writes sitemap.xml and feed.xml (implies --site-index)"
+    )
+    parser.add_argument(
+        "--explain", action="store_true",
+        help="Print why each page is rebuilt and which pages depend on it"
+    )
+    parser.add_argument(
+        "--log", choices=LOG_MODES, default="verbose",
+        help="verbose prints every page, progress draws a progress bar and quiet only reports summaries and errors"
+    )
+    parser.add_argument(
+        "--fsync", action="store_true",
+        help="fsync every written page before renaming it into place"
+    )
+    args = parser.parse_args(argv)
+    if args.staged and args.watch:
+        parser.error("--staged publishes whole builds, it can't be combined with --watch")
+    if args.keep_builds < 1:
+        parser.error("--keep-builds must be at least 1")
+    return args
 
 
-def main():
-    copy_dir_to_new_dir(r"static", r"public")
-    generate_pages_recursive(r"content",
-                             r"template.html",
-                             r"public")
+def main(argv=None):
+    args = parse_args(argv)
+    set_log_mode(args.log)
+    if args.rollback:
+        build_dir = rollback(r"public", BUILDS_DIR)
+        if os.path.exists(build_manifest_path(build_dir)):
+            save_manifest(load_manifest(build_manifest_path(build_dir)), MANIFEST_PATH)
+        info(f"public now points at {build_dir}")
+        return
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    profile = BuildProfile() if args.profile or args.profile_json else None
+    stages = profile if profile is not None else NO_PROFILE
+    dest_dir = r"public"
+    manifest_path = MANIFEST_PATH
+    if args.staged:
+        with stages.stage("stage"):
+            dest_dir, previous = stage_build(r"public", BUILDS_DIR, args.clean)
+        # Each build carries the manifest describing it, so a rollback doesn't leave the next build trusting stale outputs
+        if previous is not None and os.path.exists(build_manifest_path(previous)):
+            manifest_path = build_manifest_path(previous)
+    manifest = load_manifest(manifest_path)
+    cache_dir = None if args.no_content_cache else CONTENT_CACHE_DIR
+    # Search terms stay out of the manifest, they're only rewritten when a page's terms change
+    search_terms = None
+    if args.site_index or args.base_url:
+        search_terms = SearchTerms(os.path.join(CONTENT_CACHE_DIR, SEARCH_TERMS))
+    assets = None
+    succeeded = False
+    with stages.stage("copy_static"):
+        if args.clean and not args.staged:
+            copy_dir_to_new_dir(r"static", dest_dir)
+        if args.fingerprint:
+            assets = fingerprint_dir_to_new_dir(r"static", dest_dir, args.link, args.checksum,
+                                                manifest_outputs(manifest), manifest.setdefault("asset_digests", {}))
+        elif args.staged or not args.clean:
+            sync_dir_to_new_dir(r"static", dest_dir, args.link, args.checksum, manifest_outputs(manifest))
+    try:
+        generate_pages_recursive(r"content",
+                                 r"template.html",
+                                 dest_dir,
+                                 manifest,
+                                 jobs,
+                                 profile,
+                                 args.minify,
+                                 assets,
+                                 cache_dir,
+                                 args.fsync,
+                                 args.site_index,
+                                 args.base_url,
+                                 args.explain,
+                                 search_terms)
+        if args.compress:
+            with stages.stage("compress"):
+                written, saved = compress_outputs(dest_dir, jobs)
+            info(f"Compressed {len(written)} files, saving {saved / 1024:.1f}KiB")
+        if args.staged:
+            save_manifest(manifest, build_manifest_path(dest_dir))
+            with stages.stage("publish"):
+                removed = publish_build(dest_dir, r"public", BUILDS_DIR, args.keep_builds)
+            info(f"Published {dest_dir}, removed {len(removed)} old builds")
+        succeeded = True
+    except Exception as e:
+        if args.staged:
+            # The live site never saw the failed build
+            discard_build(dest_dir)
+        if not args.watch:
+            raise
+        print(e)
+    finally:
+        if succeeded or not args.staged:
+            save_manifest(manifest, MANIFEST_PATH)
+            if search_terms is not None:
+                search_terms.save()
+        if profile is not None:
+            print(profile.report(args.slowest))
+            if args.profile_json:
+                profile.write_json(args.profile_json, args.slowest)
+    if args.watch:
+        watch(r"content", r"template.html", r"static", r"public", manifest, MANIFEST_PATH, port=args.port,
+              minify=args.minify, assets=assets, cache_dir=cache_dir, fsync=args.fsync,
+              site_index=args.site_index, base_url=args.base_url, explain=args.explain, search_terms=search_terms)
 
 
 if __name__ == "__main__":
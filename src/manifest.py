@@ -0,0 +1,56 @@
+import json
+import os
+
+from utility import atomic_write, hash_file
+
+MANIFEST_PATH = ".build-manifest.json"
+
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {"pages": {}}
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        # A corrupt manifest only costs us a full rebuild
+        return {"pages": {}}
+    manifest.setdefault("pages", {})
+    return manifest
+
+
+def save_manifest(manifest, path):
+    with atomic_write(path) as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+
+
+def page_rebuild_reasons(entry, source_hash, template_hash, output, dest_dir_path, variables="", assets=None):
+    # assets are the fingerprints the page references now, None when the entry predates recording them
+    if entry is None:
+        return ["new page"]
+    reasons = []
+    if entry["source"] != source_hash:
+        reasons.append("source changed")
+    if entry["template"] != template_hash:
+        same_file = entry["template"].split("-", 1)[0] == template_hash.split("-", 1)[0]
+        reasons.append("build options or template assets changed" if same_file else "template changed")
+    if entry["output"] != output:
+        reasons.append("output path changed")
+    elif not os.path.isfile(os.path.join(dest_dir_path, output)):
+        reasons.append("output missing")
+    if entry.get("variables", "") != variables:
+        reasons.append("list, tag or related pages changed")
+    if assets is None:
+        reasons.append("asset dependencies not recorded yet")
+    else:
+        recorded = entry.get("assets", {})
+        changed = sorted(url for url in set(assets) | set(recorded) if assets.get(url) != recorded.get(url))
+        if changed:
+            reasons.append(f"assets changed: {', '.join(changed)}")
+    return reasons
+
+
+def manifest_outputs(manifest):
+    # Sitemap, feed and search shards are build outputs too, syncing static files must leave them alone
+    return ({entry["output"] for entry in manifest["pages"].values()} | set(manifest.get("indexes", ()))
+            | set(manifest.get("tags", ())))
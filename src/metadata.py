@@ -0,0 +1,224 @@
+import hashlib
+import heapq
+import json
+import os
+import re
+from collections import Counter
+
+from htmlnode import LeafNode, ParentNode
+from siteindex import page_url
+
+FRONTMATTER_FENCE = "---"
+TAGS_DIR = "tags"
+RELATED_COUNT = 3
+INT_RE = re.compile(r"-?\d+")
+SLUG_RE = re.compile(r"[^\w]+")
+
+
+def parse_value(raw):
+    raw = raw.strip()
+    if len(raw) >= 2 and raw[0] == raw[-1] and raw[0] in "'\"":
+        return raw[1:-1]
+    if raw.startswith("[") and raw.endswith("]"):
+        return [parse_value(item) for item in raw[1:-1].split(",") if item.strip()]
+    if raw in ("true", "false"):
+        return raw == "true"
+    if INT_RE.fullmatch(raw):
+        return int(raw)
+    return raw
+
+
+def parse_frontmatter(lines):
+    # The small slice of YAML pages need: scalars, quoted strings, [inline] lists and "- item" lists
+    meta = {}
+    key = None
+    for line in lines:
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if stripped.startswith("- ") and key is not None and isinstance(meta[key], list):
+            meta[key].append(parse_value(stripped[2:]))
+            continue
+        key, sep, value = stripped.partition(":")
+        key = key.strip()
+        if not sep or not key:
+            raise ValueError(f"Invalid frontmatter line: {line.rstrip()}")
+        meta[key] = parse_value(value) if value.strip() else []
+    return meta
+
+
+def split_frontmatter(markdown):
+    if not markdown.startswith(FRONTMATTER_FENCE + "\n"):
+        return {}, markdown
+    lines = markdown.split("\n")
+    for i in range(1, len(lines)):
+        if lines[i].rstrip() == FRONTMATTER_FENCE:
+            body = i + 1
+            # Blank lines after the fence are skipped like read_frontmatter does, even ones holding only spaces
+            while body < len(lines) and not lines[body].strip():
+                body += 1
+            return parse_frontmatter(lines[1:i]), "\n".join(lines[body:])
+    raise ValueError("Unterminated frontmatter")
+
+
+def read_frontmatter(f):
+    # Leaves f at the first non-blank line of the markdown, so a page can be read without its frontmatter
+    if f.readline() != FRONTMATTER_FENCE + "\n":
+        f.seek(0)
+        return {}
+    lines = []
+    for line in iter(f.readline, ""):
+        if line.rstrip() == FRONTMATTER_FENCE:
+            break
+        lines.append(line)
+    else:
+        raise ValueError("Unterminated frontmatter")
+    meta = parse_frontmatter(lines)
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line or line.strip():
+            break
+    f.seek(position)
+    return meta
+
+
+def page_tags(meta):
+    tags = meta.get("tags", [])
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    elif not isinstance(tags, list):
+        tags = [tags]
+    return [str(tag).strip() for tag in tags if str(tag).strip()]
+
+
+def tag_slugs(tags):
+    # Distinct tags never share a page: "C++" and "C#" both come out as "c", so the later one gets a number
+    slugs = {}
+    for tag in sorted(tags):
+        base = SLUG_RE.sub("-", tag.lower()).strip("-") or "tag"
+        slug = base
+        number = 2
+        while slug in slugs.values():
+            slug = f"{base}-{number}"
+            number += 1
+        slugs[tag] = slug
+    return slugs
+
+
+def tag_output(slug):
+    return os.path.join(TAGS_DIR, slug, "index.html")
+
+
+def newest_first(records, sources):
+    # Undated pages go last, pages from the same day by title
+    dated = sorted(sources, key=lambda source: records[source]["title"])
+    return sorted(dated, key=lambda source: str(records[source]["meta"].get("date", "")), reverse=True)
+
+
+def page_list(records, outputs, sources):
+    if not sources:
+        return ""
+    items = [ParentNode("li", [LeafNode(records[source]["title"], "a",
+                                        {"href": page_url(outputs[source])})]) for source in sources]
+    return ParentNode("ul", items).to_html()
+
+
+def tag_links(tags, slugs):
+    return ", ".join(LeafNode(tag, "a", {"href": page_url(tag_output(slugs[tag]))}).to_html() for tag in tags)
+
+
+def build_tag_map(records):
+    tagged = {}
+    for source, record in records.items():
+        for tag in dict.fromkeys(page_tags(record["meta"])):
+            tagged.setdefault(tag, []).append(source)
+    return tagged
+
+
+def rank_tags(records, tagged):
+    # Every tag's pages newest first, sorted once for the whole site instead of again for each page sharing the tag
+    order = {source: i for i, source in enumerate(newest_first(records, records))}
+    return order, {tag: sorted(sources, key=order.__getitem__) for tag, sources in tagged.items()}
+
+
+def tag_digest(records, ranked):
+    # Covers everything a related list shows or ranks by: which pages carry the tag, their order and their titles
+    members = [[source, records[source]["title"]] for source in ranked]
+    return hashlib.sha256(json.dumps(members).encode()).hexdigest()[:16]
+
+
+def tag_mates(records, tagged, source):
+    return sorted({other for tag in page_tags(records[source]["meta"]) for other in tagged[tag]} - {source})
+
+
+def related_pages(order, ranked, tags, source):
+    # Ranked by how many tags they share with the page, then newest first
+    tags = list(dict.fromkeys(tags))
+    if len(tags) == 1:
+        return [other for other in ranked[tags[0]][:RELATED_COUNT + 1] if other != source][:RELATED_COUNT]
+    shared = Counter(other for tag in tags for other in ranked[tag] if other != source)
+    return heapq.nsmallest(RELATED_COUNT, shared, key=lambda other: (-shared[other], order[other]))
+
+
+def listed_section(meta, source, dir_path_content):
+    listing = meta.get("list")
+    if listing is True:
+        return os.path.dirname(source)
+    if isinstance(listing, str) and listing:
+        return os.path.join(dir_path_content, listing)
+    return None
+
+
+def page_variables(records, outputs, dir_path_content, digests=None):
+    # Everything a page shows about other pages, worked out once from the index instead of by every page.
+    # Also returns, for list pages, the pages their lists were made from. Tag-mates aren't recorded, every page
+    # would list every other page sharing a tag, and build_tag_map gives them back from the index anyway.
+    # digests holds each tag's tag_digest from the last build and is updated in place. A page keeps the related list
+    # stored in its record until one of its tags changes, so an unchanged site doesn't rank every tag-mate again
+    tagged = build_tag_map(records)
+    slugs = tag_slugs(tagged)
+    order, ranked = rank_tags(records, tagged)
+    previous = dict(digests) if digests is not None else {}
+    current = {tag: tag_digest(records, sources) for tag, sources in ranked.items()}
+    variables = {}
+    depends = {}
+    for source, record in records.items():
+        # Empty rather than missing, so a shared template's slots don't show up raw on untagged pages
+        values = {"Tags": "", "Related": "", "Pages": ""}
+        used = set()
+        tags = page_tags(record["meta"])
+        if tags:
+            values["Tags"] = tag_links(tags, slugs)
+            related = record.get("related")
+            if related is None or any(current[tag] != previous.get(tag) for tag in tags):
+                related = record["related"] = related_pages(order, ranked, tags, source)
+            values["Related"] = page_list(records, outputs, related)
+        section = listed_section(record["meta"], source, dir_path_content)
+        if section is not None:
+            prefix = os.path.join(os.path.normpath(section), "")
+            members = [other for other in records if other != source and os.path.normpath(other).startswith(prefix)]
+            values["Pages"] = page_list(records, outputs, newest_first(records, members))
+            used.update(members)
+        variables[source] = values
+        depends[source] = sorted(used - {source})
+    if digests is not None:
+        digests.clear()
+        digests.update(current)
+    return variables, depends
+
+
+def template_values(variables, meta):
+    # Frontmatter fields fill the template slots of the same name, lists as comma separated text
+    values = dict(variables) if variables else {}
+    for key, value in meta.items():
+        values[key] = ", ".join(str(item) for item in value) if isinstance(value, list) else value
+    if "title" in meta:
+        values["Title"] = str(meta["title"])
+    return values
+
+
+def variables_digest(values):
+    if not values or not any(values.values()):
+        return ""
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
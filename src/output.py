@@ -0,0 +1,155 @@
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from utility import atomic_write
+
+LOG_MODES = ("verbose", "progress", "quiet")
+WRITER_THREADS = 4
+WRITER_QUEUE_LIMIT = 64
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_log_mode = "verbose"
+
+
+def set_log_mode(mode):
+    global _log_mode
+    if mode not in LOG_MODES:
+        raise ValueError(f"Invalid log mode {mode}")
+    _log_mode = mode
+
+
+def get_log_mode():
+    return _log_mode
+
+
+def log(message):
+    # Per-file chatter, only wanted when watching the build closely
+    if _log_mode == "verbose":
+        print(message)
+
+
+def info(message):
+    if _log_mode != "quiet":
+        print(message)
+
+
+class Progress:
+    def __init__(self, total, label="pages", interval=0.1):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        self.done = 0
+        self.last_draw = 0
+        self.enabled = _log_mode == "progress" and total > 0
+
+    def update(self, amount=1):
+        self.done += amount
+        now = time.monotonic()
+        # Redrawing on every page would make the terminal the bottleneck again
+        if self.enabled and (now - self.last_draw >= self.interval or self.done == self.total):
+            self.last_draw = now
+            filled = 30 * self.done // self.total
+            sys.stdout.write(f"\r[{'#' * filled}{' ' * (30 - filled)}] {self.done}/{self.total} {self.label}")
+            sys.stdout.flush()
+
+    def finish(self):
+        if self.enabled:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+
+
+def make_dirs(paths):
+    # One makedirs per distinct directory instead of one per file
+    created = set()
+    for path in paths:
+        directory = os.path.dirname(path)
+        if directory and directory not in created:
+            os.makedirs(directory, exist_ok=True)
+            created.add(directory)
+
+
+def copy_prefix(src, dst, size):
+    src.seek(0)
+    while size:
+        chunk = src.read(min(size, COPY_CHUNK_SIZE))
+        dst.write(chunk)
+        size -= len(chunk)
+
+
+def stream_output(path, fill, fsync=False):
+    # fill(write) streams the page out. While it matches the file already there byte for byte nothing is written, a
+    # temporary file is only opened at the first difference, starting with the matching part copied from the old file
+    if not os.path.isdir(os.path.dirname(path) or "."):
+        # Directories are normally created up front, this only happens for pages written on their own
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with ExitStack() as stack:
+        try:
+            old = stack.enter_context(open(path, 'rb'))
+        except FileNotFoundError:
+            old = None
+        matched = 0
+        out = None
+
+        def diverge():
+            nonlocal out
+            out = stack.enter_context(atomic_write(path, 'wb'))
+            if matched:
+                copy_prefix(old, out, matched)
+
+        def write(text):
+            nonlocal matched
+            data = text.encode()
+            if out is None:
+                if old is not None and old.read(len(data)) == data:
+                    matched += len(data)
+                    return
+                diverge()
+            out.write(data)
+
+        fill(write)
+        if out is None:
+            # An identical file keeps its mtime, so rsync, CDNs and the compress stage all see it as unchanged
+            if old is not None and not old.read(1):
+                return False
+            diverge()
+        if fsync:
+            out.flush()
+            os.fsync(out.fileno())
+        if old is not None:
+            old.close()
+    return True
+
+
+def write_output(path, text, fsync=False):
+    return stream_output(path, lambda write: write(text), fsync)
+
+
+class OutputWriter:
+    # Rendering carries on while a few threads stream finished pages to disk, at most queue_limit of them wait
+    def __init__(self, threads=WRITER_THREADS, queue_limit=WRITER_QUEUE_LIMIT, fsync=False):
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.slots = threading.BoundedSemaphore(queue_limit)
+        self.fsync = fsync
+        self.futures = []
+
+    def submit(self, path, fill):
+        self.slots.acquire()
+        future = self.executor.submit(stream_output, path, fill, self.fsync)
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append((path, future))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        errors = {}
+        written = 0
+        for path, future in self.futures:
+            error = future.exception()
+            if error is not None:
+                errors[path] = f"{type(error).__name__}: {error}"
+            elif future.result():
+                written += 1
+        return written, errors
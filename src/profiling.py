@@ -0,0 +1,88 @@
+import json
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class BuildProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.pages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name, page=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, page)
+
+    def record(self, name, seconds, page=None):
+        self.stages[name] = self.stages.get(name, 0) + seconds
+        if page is not None:
+            timings = self.pages.setdefault(page, {})
+            timings[name] = timings.get(name, 0) + seconds
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge_counters(self, counters):
+        for name, amount in counters.items():
+            self.count(name, amount)
+
+    def merge_pages(self, pages):
+        # Pages rendered in worker processes come back as plain dicts
+        for page, timings in pages.items():
+            for name, seconds in timings.items():
+                self.record(name, seconds, page)
+
+    def slowest_pages(self, count):
+        totals = [(sum(timings.values()), page) for page, timings in self.pages.items()]
+        return sorted(totals, reverse=True)[:count]
+
+    def to_dict(self, slowest=10):
+        return {
+            "wall_seconds": time.perf_counter() - self.started,
+            "stages": self.stages,
+            "pages": self.pages,
+            "counters": self.counters,
+            "slowest": [{"page": page, "seconds": seconds} for seconds, page in self.slowest_pages(slowest)],
+        }
+
+    def report(self, slowest=10):
+        stage_total = sum(self.stages.values()) or 1
+        lines = [f"Build profile ({time.perf_counter() - self.started:.3f}s wall, {len(self.pages)} pages)"]
+        for name, seconds in self.stages.items():
+            lines.append(f"  {name:24} {seconds * 1000:10.2f}ms {seconds / stage_total:7.1%}")
+        for name, amount in sorted(self.counters.items()):
+            lines.append(f"  {name:24} {amount:10}")
+        if self.pages:
+            lines.append(f"Slowest {min(slowest, len(self.pages))} pages")
+            for seconds, page in self.slowest_pages(slowest):
+                lines.append(f"  {seconds * 1000:10.2f}ms  {page}")
+        return "\n".join(lines)
+
+    def write_json(self, path, slowest=10):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(slowest), f, indent=1)
+
+
+class NullProfile:
+    def stage(self, name, page=None):
+        return nullcontext()
+
+    def record(self, name, seconds, page=None):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def merge_counters(self, counters):
+        pass
+
+    def merge_pages(self, pages):
+        pass
+
+
+NO_PROFILE = NullProfile()
@@ -0,0 +1,240 @@
+import html
+import json
+import os
+import re
+from datetime import datetime, timezone
+from email.utils import formatdate
+from xml.sax.saxutils import escape
+
+from output import write_output
+from utility import atomic_write
+
+SITEMAP = "sitemap.xml"
+FEED = "feed.xml"
+SEARCH_DIR = "search"
+SEARCH_PAGES = "pages.json"
+SEARCH_TERMS = "search-terms.json"
+FEED_SIZE = 20
+SUMMARY_LENGTH = 200
+# Terms are sharded by their first characters, the browser fetches only the shards of the words it looks up
+SEARCH_SHARD_PREFIX = 2
+TERM_RE = re.compile(r"[^\W_]+")
+SHARD_RE = re.compile(r"[a-z0-9]+")
+MARKUP_RE = re.compile(r"<[^>]*>")
+
+
+class PageText:
+    # Gathers what the indexes need from a page's text without keeping the text itself
+    __slots__ = ("summary", "terms")
+
+    def __init__(self):
+        self.summary = ""
+        self.terms = set()
+
+    def add(self, text):
+        if len(self.summary) < SUMMARY_LENGTH:
+            self.summary = " ".join(f"{self.summary} {text}".split())[:SUMMARY_LENGTH]
+        self.terms.update(term.lower() for term in TERM_RE.findall(text))
+
+    def add_node(self, node):
+        # Leaf values are the text of the TextNodes the block was made from
+        if node.children is None:
+            if node.value:
+                self.add(node.value)
+            return
+        for child in node.children:
+            self.add_node(child)
+
+    def add_content(self, content):
+        if isinstance(content, str):
+            # Content from the cache is already HTML
+            self.add(html.unescape(MARKUP_RE.sub(" ", content)))
+        else:
+            self.add_node(content)
+
+    def entry(self, title):
+        return {"title": short_title(title), "summary": self.summary, "terms": sorted(self.terms)}
+
+
+def short_title(title):
+    # extract_title runs up to the next '#', only its first line is the page's title
+    return str(title).strip().split("\n", 1)[0].strip()
+
+
+class SearchTerms:
+    # Every page's terms grouped by shard, kept in a sidecar file instead of the manifest. It tracks which shards
+    # gained or lost terms, so only those are written again
+    def __init__(self, path=None):
+        self.path = path
+        self.reset()
+        if path is None or not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            self.pages, self.numbering, self.token = data["pages"], data["numbering"], data["token"]
+        except (OSError, ValueError, KeyError):
+            # Pages missing from the store are rendered again
+            self.reset()
+        for source, shards in self.pages.items():
+            for shard in shards:
+                self.shard_pages.setdefault(shard, set()).add(source)
+
+    def reset(self):
+        self.pages = {}
+        self.numbering = None
+        self.token = None
+        self.shard_pages = {}
+        self.dirty = set()
+        self.changed = False
+
+    def touch(self):
+        # The manifest records the token it was saved with, a store out of step with it is thrown away
+        self.changed = True
+        self.token = os.urandom(8).hex()
+
+    def update(self, source, terms):
+        shards = {}
+        for term in terms:
+            shards.setdefault(search_shard(term), []).append(term)
+        old = self.pages.get(source)
+        if old == shards:
+            return
+        old = old or {}
+        self.dirty.update(shard for shard in set(old) | set(shards) if old.get(shard) != shards.get(shard))
+        self.leave(source, set(old) - set(shards))
+        for shard in shards:
+            self.shard_pages.setdefault(shard, set()).add(source)
+        self.pages[source] = shards
+        self.touch()
+
+    def remove(self, source):
+        shards = self.pages.pop(source, None)
+        if shards is not None:
+            self.dirty.update(shards)
+            self.leave(source, shards)
+            self.touch()
+
+    def leave(self, source, shards):
+        for shard in shards:
+            self.shard_pages[shard].discard(source)
+            if not self.shard_pages[shard]:
+                del self.shard_pages[shard]
+
+    def take_dirty(self, numbering):
+        # A page added, removed or moved renumbers the pages after it, which can touch every shard
+        if numbering != self.numbering:
+            self.numbering = numbering
+            self.touch()
+            self.dirty = set(self.shard_pages)
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+    def shard_terms(self, shard, numbers):
+        terms = {}
+        for source in self.shard_pages.get(shard, ()):
+            for term in self.pages[source][shard]:
+                terms.setdefault(term, []).append(numbers[source])
+        for pages in terms.values():
+            pages.sort()
+        return terms
+
+    def save(self):
+        if self.path is None or not self.changed:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with atomic_write(self.path) as f:
+            f.write(compact_json({"pages": self.pages, "numbering": self.numbering, "token": self.token}))
+        self.changed = False
+
+
+def page_url(output):
+    url = "/" + output.replace(os.sep, "/")
+    if url.endswith("/index.html"):
+        return url[:-len("index.html")]
+    return url
+
+
+def absolute_url(base_url, output):
+    return base_url.rstrip("/") + page_url(output)
+
+
+def source_mtime(source):
+    try:
+        return os.stat(source).st_mtime
+    except FileNotFoundError:
+        return 0
+
+
+def render_sitemap(pages, base_url):
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for page in pages:
+        lastmod = datetime.fromtimestamp(page["mtime"], timezone.utc).date().isoformat()
+        lines.append(f"<url><loc>{escape(absolute_url(base_url, page['output']))}</loc>"
+                     f"<lastmod>{lastmod}</lastmod></url>")
+    lines.append("</urlset>")
+    return "\n".join(lines) + "\n"
+
+
+def render_feed(pages, base_url):
+    home = next((page for page in pages if page["output"] == "index.html"), None)
+    title = home["title"] if home else base_url
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             '<rss version="2.0"><channel>',
+             f"<title>{escape(title)}</title>",
+             f"<link>{escape(absolute_url(base_url, ''))}</link>",
+             f"<description>{escape(home['summary'] if home else title)}</description>"]
+    # Newest first, by when the markdown was last edited
+    for page in sorted(pages, key=lambda page: page["mtime"], reverse=True)[:FEED_SIZE]:
+        url = escape(absolute_url(base_url, page["output"]))
+        lines.append(f"<item><title>{escape(page['title'])}</title><link>{url}</link><guid>{url}</guid>"
+                     f"<pubDate>{formatdate(page['mtime'], usegmt=True)}</pubDate>"
+                     f"<description>{escape(page['summary'])}</description></item>")
+    lines.append("</channel></rss>")
+    return "\n".join(lines) + "\n"
+
+
+def search_shard(term):
+    prefix = term[:SEARCH_SHARD_PREFIX]
+    return prefix if SHARD_RE.fullmatch(prefix) else "_"
+
+
+def compact_json(data):
+    return json.dumps(data, separators=(",", ":"), sort_keys=True, ensure_ascii=False)
+
+
+def write_search_index(dest_dir_path, pages, search_terms):
+    # Pages are numbered once in pages.json, shards map each term to the numbers of the pages containing it.
+    # Returns every index file and the ones that were actually written
+    numbering = [page["source_path"] for page in pages]
+    numbers = {source: number for number, source in enumerate(numbering)}
+    search_dir = os.path.join(dest_dir_path, SEARCH_DIR)
+    os.makedirs(search_dir, exist_ok=True)
+    outputs = [os.path.join(SEARCH_DIR, SEARCH_PAGES)]
+    written = []
+    if write_output(os.path.join(dest_dir_path, outputs[0]),
+                    compact_json([[page_url(page["output"]), page["title"]] for page in pages])):
+        written.append(outputs[0])
+    dirty = search_terms.take_dirty(numbering)
+    for shard in sorted(search_terms.shard_pages):
+        output = os.path.join(SEARCH_DIR, f"{shard}.json")
+        outputs.append(output)
+        # A shard deleted from the output directory is written again even though its terms didn't change
+        if (shard in dirty or not os.path.isfile(os.path.join(dest_dir_path, output))) and write_output(
+                os.path.join(dest_dir_path, output), compact_json(search_terms.shard_terms(shard, numbers))):
+            written.append(output)
+    return outputs, written
+
+
+def write_site_indexes(dest_dir_path, pages, search_terms, base_url=None):
+    # pages are manifest entries extended with the source path, sorted by output so the indexes are stable
+    pages = sorted((dict(page, mtime=source_mtime(page["source_path"])) for page in pages),
+                   key=lambda page: page["output"])
+    outputs, written = write_search_index(dest_dir_path, pages, search_terms)
+    if base_url:
+        for output, text in ((SITEMAP, render_sitemap(pages, base_url)), (FEED, render_feed(pages, base_url))):
+            outputs.append(output)
+            if write_output(os.path.join(dest_dir_path, output), text):
+                written.append(output)
+    return outputs, written
@@ -0,0 +1,107 @@
+import os
+import shutil
+from datetime import datetime
+
+BUILDS_DIR = ".builds"
+KEEP_BUILDS = 3
+
+
+def new_build_id():
+    # Sorts in build order, which is what rollback and pruning go by
+    return datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+
+def list_builds(builds_dir):
+    if not os.path.isdir(builds_dir):
+        return []
+    return sorted(name for name in os.listdir(builds_dir) if os.path.isdir(os.path.join(builds_dir, name)))
+
+
+def build_manifest_path(build_dir):
+    return f"{build_dir}.manifest.json"
+
+
+def current_build(public, builds_dir):
+    if not os.path.islink(public):
+        return None
+    target = os.path.realpath(public)
+    if os.path.dirname(target) != os.path.realpath(builds_dir) or not os.path.isdir(target):
+        return None
+    return os.path.join(builds_dir, os.path.basename(target))
+
+
+def point_public_at(public, build_dir):
+    # A new symlink renamed over the old one, so readers see either the old build or the new one, never a mix
+    tmp_path = f"{public}.tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    os.symlink(os.path.relpath(build_dir, os.path.dirname(os.path.abspath(public))), tmp_path)
+    os.replace(tmp_path, public)
+
+
+def adopt_public(public, builds_dir):
+    # A public/ from before staged builds becomes the first build, so it can be reused and rolled back to
+    build_dir = os.path.join(builds_dir, new_build_id())
+    os.replace(public, build_dir)
+    point_public_at(public, build_dir)
+    return build_dir
+
+
+def clone_build(old, new):
+    # Hard links cost no data copies, and every writer replaces files instead of rewriting them,
+    # so the previous build never sees this one's changes
+    for dir_path, _, file_names in os.walk(old):
+        dest_dir = os.path.join(new, os.path.relpath(dir_path, old))
+        os.makedirs(dest_dir, exist_ok=True)
+        for name in file_names:
+            os.link(os.path.join(dir_path, name), os.path.join(dest_dir, name))
+
+
+def stage_build(public, builds_dir, clean=False):
+    os.makedirs(builds_dir, exist_ok=True)
+    if os.path.isdir(public) and not os.path.islink(public):
+        adopt_public(public, builds_dir)
+    previous = current_build(public, builds_dir)
+    staging = os.path.join(builds_dir, new_build_id())
+    if previous is None or clean:
+        os.makedirs(staging)
+    else:
+        clone_build(previous, staging)
+    return staging, previous
+
+
+def discard_build(build_dir):
+    shutil.rmtree(build_dir, ignore_errors=True)
+    if os.path.exists(build_manifest_path(build_dir)):
+        os.remove(build_manifest_path(build_dir))
+
+
+def prune_builds(public, builds_dir, keep=KEEP_BUILDS):
+    current = current_build(public, builds_dir)
+    builds = list_builds(builds_dir)
+    removed = []
+    for name in builds[:max(0, len(builds) - keep)]:
+        build_dir = os.path.join(builds_dir, name)
+        if current is not None and os.path.basename(current) == name:
+            continue
+        discard_build(build_dir)
+        removed.append(build_dir)
+    return removed
+
+
+def publish_build(staging, public, builds_dir, keep=KEEP_BUILDS):
+    point_public_at(public, staging)
+    return prune_builds(public, builds_dir, keep)
+
+
+def rollback(public, builds_dir):
+    current = current_build(public, builds_dir)
+    builds = list_builds(builds_dir)
+    if current is None or os.path.basename(current) not in builds:
+        raise Exception(f"{public} is not a staged build")
+    index = builds.index(os.path.basename(current))
+    if index == 0:
+        raise Exception("No earlier build to roll back to")
+    previous = os.path.join(builds_dir, builds[index - 1])
+    point_public_at(public, previous)
+    return previous
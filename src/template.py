@@ -0,0 +1,133 @@
+import os
+import re
+
+from assets import rewrite_asset_references
+
+SLOT_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+SECTION_TEMPLATE = "_template.html"
+# Comments, elements whose contents are kept verbatim, tags and the text between them
+HTML_TOKEN_RE = re.compile(
+    r"<!--.*?-->|<(pre|code|textarea|script|style)\b[^>]*>.*?</\1\s*>|<[/!?a-zA-Z][^>]*>|[^<]+|<",
+    re.DOTALL | re.IGNORECASE,
+)
+TAG_NAME_RE = re.compile(r"</?([a-zA-Z][\w-]*|!doctype)", re.IGNORECASE)
+WHITESPACE_RE = re.compile(r"\s+")
+# Whitespace next to these tags never renders, next to anything else it is collapsed to a single space
+BLOCK_TAGS = {
+    "!doctype", "html", "head", "body", "title", "meta", "link", "base", "style", "script", "noscript",
+    "article", "aside", "blockquote", "div", "dl", "dt", "dd", "figure", "figcaption", "footer", "form",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p", "pre", "section",
+    "table", "thead", "tbody", "tfoot", "tr", "td", "th", "ul",
+}
+
+_compiled_templates = {}
+_section_templates = {}
+
+
+def compile_template(text):
+    # Static text sits at even indices and (name, raw slot) pairs at odd ones
+    parts = []
+    start = 0
+    for match in SLOT_RE.finditer(text):
+        parts.append(text[start:match.start()])
+        parts.append((match.group(1), match.group()))
+        start = match.end()
+    parts.append(text[start:])
+    return parts
+
+
+def is_block_tag(is_markup, token):
+    if not is_markup:
+        return False
+    match = TAG_NAME_RE.match(token)
+    return match is not None and match.group(1).lower() in BLOCK_TAGS
+
+
+def minify_html(text):
+    # (is_markup, token) pairs, comments already dropped and adjacent text merged
+    tokens = []
+    for match in HTML_TOKEN_RE.finditer(text):
+        token = match.group()
+        if token.startswith("<!--") and not token.startswith("<!--[if"):
+            # Conditional comments still mean something to old browsers
+            continue
+        if token.startswith("<") and len(token) > 1:
+            tokens.append((True, token))
+        elif tokens and not tokens[-1][0]:
+            tokens[-1] = (False, tokens[-1][1] + token)
+        else:
+            tokens.append((False, token))
+
+    chunks = []
+    for i, (is_markup, token) in enumerate(tokens):
+        if not is_markup:
+            token = WHITESPACE_RE.sub(" ", token)
+            if i == 0 or is_block_tag(*tokens[i - 1]):
+                token = token.lstrip()
+            if i == len(tokens) - 1 or is_block_tag(*tokens[i + 1]):
+                token = token.rstrip()
+        chunks.append(token)
+    return "".join(chunks)
+
+
+def load_template(path, minify=False, assets=None):
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _compiled_templates.get((path, minify))
+    if cached is None or cached[0] != key or cached[3] != assets:
+        with open(path) as f:
+            text = f.read()
+        if assets:
+            text = rewrite_asset_references(text, assets)
+        # Minifying the template once per build is all it takes, the nodes never emit whitespace between tags
+        minified = minify_html(text) if minify else text
+        cached = (key, compile_template(minified), len(text.encode()) - len(minified.encode()), assets)
+        _compiled_templates[(path, minify)] = cached
+    return cached[1]
+
+
+def minified_savings(path, assets=None):
+    # Bytes minification takes off every page rendered with this template
+    load_template(path, True, assets)
+    return _compiled_templates[(path, True)][2]
+
+
+def find_template(from_path, content_root, default_path):
+    # The nearest _template.html between the page and the content root wins
+    directory = os.path.dirname(from_path)
+    if directory in _section_templates:
+        return _section_templates[directory]
+    candidate = os.path.join(directory, SECTION_TEMPLATE)
+    if os.path.isfile(candidate):
+        template_path = candidate
+    elif os.path.normpath(directory) == os.path.normpath(content_root) or not directory:
+        template_path = default_path
+    else:
+        template_path = find_template(directory, content_root, default_path)
+    _section_templates[directory] = template_path
+    return template_path
+
+
+def clear_template_cache():
+    _compiled_templates.clear()
+    _section_templates.clear()
+
+
+def write_template(parts, values, write):
+    write(parts[0])
+    for i in range(1, len(parts), 2):
+        name, raw = parts[i]
+        value = values.get(name)
+        if value is None:
+            write(raw)
+        elif hasattr(value, "write_html"):
+            value.write_html(write)
+        else:
+            write(str(value))
+        write(parts[i + 1])
+
+
+def render_template(parts, values):
+    chunks = []
+    write_template(parts, values, chunks.append)
+    return "".join(chunks)
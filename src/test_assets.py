@@ -0,0 +1,99 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from blocks import *
+
+
+class TestAssets(unittest.TestCase):
+    def setUp(self):
+        clear_template_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.static, "images"))
+        os.makedirs(self.content)
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+        self.write(self.template, '<link href="/index.css" rel="stylesheet">{{ Content }}')
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![a](/images/a.png) [css](/index.css#top)")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_fingerprinted_path(self):
+        self.assertEqual(fingerprinted_path("images/a.png", "72945f7e0000"), "images/a.72945f7e.png")
+
+    def test_fingerprint_dir_writes_hashed_files_and_manifest(self):
+        assets = fingerprint_dir_to_new_dir(self.static, self.public)
+        css = assets["/index.css"]
+        self.assertRegex(css, r"^/index\.[0-9a-f]{8}\.css$")
+        self.assertEqual(self.read(os.path.join(self.public, css[1:])), "body {}")
+        self.assertFalse(os.path.exists(os.path.join(self.public, "index.css")))
+        with open(os.path.join(self.public, ASSET_MANIFEST)) as f:
+            self.assertEqual(json.load(f), assets)
+
+    def test_changed_asset_gets_a_new_name_and_the_old_one_goes(self):
+        old = fingerprint_dir_to_new_dir(self.static, self.public)["/index.css"]
+        self.write(os.path.join(self.static, "index.css"), "body { margin: 0; }")
+        new = fingerprint_dir_to_new_dir(self.static, self.public)["/index.css"]
+        self.assertNotEqual(old, new)
+        self.assertFalse(os.path.exists(os.path.join(self.public, old[1:])))
+        self.assertTrue(os.path.exists(os.path.join(self.public, new[1:])))
+
+    def test_unchanged_files_reuse_their_recorded_digest(self):
+        digests = {}
+        fingerprint_dir_to_new_dir(self.static, self.public, digests=digests)
+        self.assertEqual(sorted(digests), [os.path.join("images", "a.png"), "index.css"])
+        # A digest that doesn't match the content proves the file wasn't read again
+        digests["index.css"]["digest"] = "0123456789abcdef"
+        self.assertEqual(fingerprint_dir_to_new_dir(self.static, self.public, digests=digests)["/index.css"],
+                         "/index.01234567.css")
+        self.write(os.path.join(self.static, "index.css"), "body { margin: 0; }")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        self.assertNotEqual(fingerprint_dir_to_new_dir(self.static, self.public, digests=digests)["/index.css"],
+                            "/index.01234567.css")
+        self.assertEqual(list(digests), ["index.css"])
+
+    def test_resolve_asset_url(self):
+        assets = {"/index.css": "/index.abc.css"}
+        self.assertEqual(resolve_asset_url("/index.css", assets), "/index.abc.css")
+        self.assertEqual(resolve_asset_url("/index.css?v=1", assets), "/index.abc.css?v=1")
+        self.assertEqual(resolve_asset_url("/other.css", assets), "/other.css")
+
+    def test_rewrite_asset_urls_copies_only_changed_nodes(self):
+        assets = {"/a.png": "/a.abc.png"}
+        untouched = ParentNode("p", [LeafNode("text")])
+        tree = ParentNode("div", [untouched, ParentNode("p", [LeafNode("", "img", {"src": "/a.png"})])])
+        rewritten = rewrite_asset_urls(tree, assets)
+        self.assertIsNot(rewritten, tree)
+        self.assertIs(rewritten.children[0], untouched)
+        self.assertEqual(rewritten.to_html(), '<div><p>text</p><p><img src="/a.abc.png"></img></p></div>')
+        self.assertEqual(tree.to_html(), '<div><p>text</p><p><img src="/a.png"></img></p></div>')
+        self.assertIs(rewrite_asset_urls(untouched, assets), untouched)
+
+    def test_build_rewrites_template_and_content_urls(self):
+        assets = fingerprint_dir_to_new_dir(self.static, self.public)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(self.content, self.template, self.public, {"pages": {}}, assets=assets)
+        html = self.read(os.path.join(self.public, "index.html"))
+        self.assertIn(f'href="{assets["/index.css"]}"', html)
+        self.assertIn(f'src="{assets["/images/a.png"]}"', html)
+        self.assertIn(f'href="{assets["/index.css"]}#top"', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
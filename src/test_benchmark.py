@@ -0,0 +1,45 @@
+import contextlib
+import io
+import unittest
+
+from benchmark import *
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpora_render(self):
+        for name, generate in CORPORA.items():
+            markdown = generate(2)
+            self.assertTrue(markdown_to_html_node(markdown).to_html().startswith("<div><h1>"), name)
+
+    def test_classifier_matches_rescanning_version(self):
+        for name in ("lists", "quotes", "paragraphs"):
+            for block in markdown_to_blocks(CORPORA[name](3)):
+                self.assertEqual(block_to_block_type(block), rescanning_block_to_block_type(block), block)
+
+    def test_bench_corpus_reports_every_stage(self):
+        results = bench_corpus("lists", generate_lists(1), 1)
+        self.assertEqual(sorted(results), ["lists/block_to_block_type", "lists/markdown_to_blocks",
+                                           "lists/markdown_to_html_node", "lists/markdown_to_html_node_warm",
+                                           "lists/text_to_text_nodes",
+                                           "lists/to_html"])
+        for result in results.values():
+            self.assertGreater(result["seconds"], 0)
+
+    def test_only_matches_corpus_and_suite_names(self):
+        names = list(CORPORA) + list(SUITES)
+        self.assertEqual(selected(names, "lists"), ["lists"])
+        self.assertEqual(selected(names, "large"), ["large_page"])
+        self.assertEqual(selected(names, "large_page/"), [])
+        self.assertEqual(selected(names, None), names)
+        self.assertEqual(run_suite(1, 1, "nothing"), {})
+
+    def test_compare_to_baseline(self):
+        baseline = {"a": {"seconds": 0.010, "peak_bytes": 1000}, "b": {"seconds": 0.010, "peak_bytes": 1000}}
+        results = {"a": {"seconds": 0.011, "peak_bytes": 1000}, "b": {"seconds": 0.020, "peak_bytes": 1000},
+                   "c": {"seconds": 1.0, "peak_bytes": 1}}
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(compare_to_baseline(results, baseline, 0.2), ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
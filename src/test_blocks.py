@@ -1,3 +1,7 @@
+import contextlib
+import io
+import os
+import tempfile
 import textwrap
 import unittest
 
@@ -218,5 +222,65 @@ I think that many confuse &#39;applicability&#39; with &#39;allegory&#39;; but t
         self.assertEqual(normalize_html(markdown_to_html_node(markdown).to_html()), normalize_html(expected_html))
         self.assertEqual(markdown_to_html_node(test1).to_html(), result1)
 
+    def test_classify_block_hands_lines_to_converters(self):
+        self.assertEqual(classify_block("> a\n> b"), (BlockType.QUOTE, ["> a", "> b"]))
+        self.assertEqual(classify_block("- a\n* b"), (BlockType.UNORDERED_LIST, ["- a", "* b"]))
+        self.assertEqual(classify_block("1. a\n2. b"), (BlockType.ORDERED_LIST, ["1. a", "2. b"]))
+        self.assertEqual(classify_block("> a\nb"), (BlockType.PARAGRAPH, ["> a", "b"]))
+        self.assertEqual(classify_block("# Title"), (BlockType.HEADING, None))
+        ten_items = "\n".join(f"{i}. item" for i in range(1, 11))
+        self.assertEqual(classify_block(ten_items)[0], block_to_block_type(ten_items))
+        block_type, lines = classify_block("- a\n- b")
+        self.assertEqual(unordered_list_block_to_htmlnode("- a\n- b", lines).to_html(),
+                         unordered_list_block_to_htmlnode("- a\n- b").to_html())
+
+    def test_iter_markdown_blocks_matches_markdown_to_blocks(self):
+        markdowns = ["", "# Title", "# Title\n\nText\n\n\n\n- a\n- b\n\n\nEnd\n", "a\n\n\nb\n\n\n\n\nc"]
+        for markdown in markdowns:
+            for size in (1, 2, 3, 7, 100):
+                chunks = [markdown[i:i + size] for i in range(0, len(markdown), size)]
+                self.assertEqual(list(iter_markdown_blocks(chunks)), markdown_to_blocks(markdown), (markdown, size))
+
+    def test_stream_page_matches_generate_page(self):
+        with tempfile.TemporaryDirectory() as root:
+            from_path = os.path.join(root, "page.md")
+            template = os.path.join(root, "template.html")
+            with open(from_path, 'w') as f:
+                f.write("# Changelog\n\n## 1.0\n\n- fixed *this*\n- added `that`\n\n```\ncode\n```\n\n> quoted")
+            with open(template, 'w') as f:
+                f.write("<title>{{ Title }}</title>{{ Content }}")
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_page(from_path, template, os.path.join(root, "generated.html"))
+            stream_page(from_path, template, os.path.join(root, "streamed.html"))
+            with open(os.path.join(root, "generated.html")) as generated, \
+                    open(os.path.join(root, "streamed.html")) as streamed:
+                self.assertEqual(streamed.read(), generated.read())
+
+    def test_read_heading_stops_early(self):
+        body = "text " * HEADING_LIMIT
+        f = io.StringIO(f"# Title\n\n{body}")
+        self.assertEqual(read_heading(f, first_line=True), " Title")
+        self.assertLessEqual(f.tell(), HEADING_CHUNK_SIZE + 1)
+        f = io.StringIO(f"# Title\n\n{body}")
+        self.assertEqual(read_heading(f), " Title")
+        self.assertLess(f.tell(), len(body))
+
+    def test_repeated_blocks_are_memoized(self):
+        notice = "Licensed under the **MIT** license, see LICENSE for details."
+        block_cache.clear()
+        nodes = [markdown_to_html_node(f"# Page {i}\n\n{notice}").children[1] for i in range(3)]
+        # The first sighting only marks the block, the second stores it and the third is a hit
+        self.assertIsNot(nodes[0], nodes[1])
+        self.assertIs(nodes[1], nodes[2])
+        self.assertEqual((block_cache.hits, block_cache.misses), (1, 5))
+        self.assertEqual(list(block_cache.entries), [notice])
+
+    def test_block_cache_is_bounded(self):
+        cache = BlockCache(max_entries=2)
+        for block in ["a", "b", "c"] * 2:
+            cache.convert(block)
+        self.assertEqual(list(cache.entries), ["b", "c"])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from blocks import *
+
+
+class TestContentCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.cache = os.path.join(self.tmp.name, "cache")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(self.content)
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.manifest = {"pages": {}}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def build(self):
+        return generate_pages_recursive(self.content, self.template, self.public, self.manifest,
+                                        cache_dir=self.cache)
+
+    def cached_path(self, name):
+        source_hash = hash_file(os.path.join(self.content, name))
+        return content_cache_path(self.cache, content_cache_key(source_hash))
+
+    def test_key_depends_on_parser_version_and_assets(self):
+        self.assertNotEqual(content_cache_key("abc"), content_cache_key("abd"))
+        self.assertNotEqual(content_cache_key("abc"), content_cache_key("abc", {"/a.css": "/a.1.css"}))
+        self.assertEqual(content_cache_key("abc", {}), content_cache_key("abc"))
+
+    def test_build_fills_the_cache(self):
+        self.build()
+        self.assertEqual(self.read(self.cached_path("index.md")), "<div><h1>Home</h1></div>")
+        self.assertEqual(os.listdir(os.path.dirname(self.cached_path("index.md"))),
+                         [os.path.basename(self.cached_path("index.md"))])
+
+    def test_template_change_reuses_cached_content(self):
+        self.build()
+        # Tampering with the entry proves the second build filled the template from the cache
+        self.write(self.cached_path("index.md"), "<p>cached</p>")
+        self.write(self.template, "<main>{{ Content }}</main>")
+        self.build()
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "<main><p>cached</p></main>")
+
+    def test_markdown_change_misses_the_cache(self):
+        self.build()
+        self.write(os.path.join(self.content, "index.md"), "# Changed")
+        self.build()
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "<div><h1>Changed</h1></div>")
+
+    def test_entries_of_removed_pages_are_pruned(self):
+        self.write(os.path.join(self.content, "other.md"), "# Other")
+        self.build()
+        stale = self.cached_path("other.md")
+        os.remove(os.path.join(self.content, "other.md"))
+        self.build()
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(self.cached_path("index.md")))
+
+
+if __name__ == "__main__":
+    unittest.main()
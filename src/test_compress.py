@@ -0,0 +1,72 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from compress import *
+
+
+class TestCompress(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+        return path
+
+    def test_compresses_text_outputs(self):
+        page = self.write("blog/index.html", "<p>hello</p>" * 100)
+        written, saved = compress_outputs(self.root)
+        self.assertIn(page + ".gz", written)
+        self.assertGreater(saved, 0)
+        with gzip.open(page + ".gz", 'rt') as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 100)
+        self.assertEqual(os.stat(page + ".gz").st_mtime_ns, os.stat(page).st_mtime_ns)
+
+    def test_skips_small_and_binary_files(self):
+        self.write("small.css", "body {}")
+        self.write("image.png", "x" * 1000)
+        written, _ = compress_outputs(self.root)
+        self.assertEqual(written, [])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "image.png.gz")))
+
+    def test_second_run_is_a_no_op(self):
+        self.write("index.html", "<p>hello</p>" * 100)
+        compress_outputs(self.root)
+        self.assertEqual(compress_outputs(self.root), ([], 0))
+
+    def test_recompresses_changed_file(self):
+        page = self.write("index.html", "<p>hello</p>" * 100)
+        compress_outputs(self.root)
+        self.write("index.html", "<p>bye</p>" * 100)
+        os.utime(page, ns=(0, os.stat(page).st_mtime_ns + 10 ** 9))
+        written, _ = compress_outputs(self.root)
+        self.assertEqual(written[0], page + ".gz")
+        with gzip.open(page + ".gz", 'rt') as f:
+            self.assertEqual(f.read(), "<p>bye</p>" * 100)
+
+    def test_removes_orphaned_siblings(self):
+        page = self.write("old.html", "<p>hello</p>" * 100)
+        compress_outputs(self.root)
+        os.remove(page)
+        compress_outputs(self.root)
+        self.assertFalse(os.path.exists(page + ".gz"))
+
+    def test_keeps_static_archives(self):
+        archive = self.write("downloads/archive.tar.gz", "not really gzip")
+        self.write("downloads/data.zst", "not really zstd")
+        self.write("index.html", "<p>hello</p>" * 100)
+        compress_outputs(self.root)
+        self.assertTrue(os.path.exists(archive))
+        self.assertTrue(os.path.exists(os.path.join(self.root, "downloads", "data.zst")))
+
+
+if __name__ == "__main__":
+    unittest.main()
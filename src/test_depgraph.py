@@ -0,0 +1,88 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from blocks import *
+
+
+class TestDependencyGraph(unittest.TestCase):
+    def test_page_links(self):
+        markdown = ("[home](/) [post](../post.html#top) ![img](/images/a.png) [ext](https://example.com) "
+                    "[mail](mailto:a@b.c) [anchor](#top) [cdn](//cdn.example.com/x.js)")
+        self.assertEqual(page_links(markdown), {"/", "../post.html#top", "/images/a.png"})
+
+    def test_page_assets(self):
+        assets = {"/a.css": "/a.1.css", "/b.png": "/b.2.png"}
+        self.assertEqual(page_assets(["/b.png?v=1", "/", "/c.js"], assets), {"/b.png": "/b.2.png"})
+        self.assertEqual(page_assets(["/b.png"], None), {})
+
+    def test_link_key(self):
+        self.assertEqual(link_key("/majesty", "/"), "/majesty")
+        self.assertEqual(link_key("/majesty/index.html", "/"), "/majesty")
+        self.assertEqual(link_key("../other.html#x", "/posts/"), "/other.html")
+        self.assertEqual(link_key("/", "/posts/"), "/")
+
+    def test_dependency_graph(self):
+        manifest = {"pages": {
+            "index.md": {"output": "index.html", "links": ["/post", "/a.png"]},
+            "post.md": {"output": os.path.join("post", "index.html"), "links": ["/"], "depends": ["list.md"]},
+            "list.md": {"output": "list.html"},
+        }}
+        graph = dependency_graph(manifest)
+        self.assertEqual(depends_on(graph, "post.md"), ["index.md"])
+        self.assertEqual(depends_on(graph, "index.md"), ["post.md"])
+        self.assertEqual(depends_on(graph, "/a.png"), ["index.md"])
+        self.assertEqual(depends_on(graph, "list.md"), ["post.md"])
+
+
+class TestAssetFanOut(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(self.content)
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[Post](/post.html)")
+        self.write(os.path.join(self.content, "post.md"), "# Post\n\n![pic](/pic.png)")
+        self.manifest = {"pages": {}}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def build(self, assets):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            set_log_mode("quiet")
+            try:
+                generated = generate_pages_recursive(self.content, self.template, self.public, self.manifest,
+                                                     assets=assets, explain=True)
+            finally:
+                set_log_mode("verbose")
+        return generated, out.getvalue()
+
+    def test_renamed_asset_rebuilds_only_the_pages_using_it(self):
+        self.build({"/pic.png": "/pic.1.png", "/other.css": "/other.1.css"})
+        generated, explained = self.build({"/pic.png": "/pic.2.png", "/other.css": "/other.1.css"})
+        post = os.path.join(self.content, "post.md")
+        self.assertEqual(generated, [os.path.join(self.public, "post.html")])
+        self.assertEqual(explained, f"{post}: assets changed: /pic.png\n"
+                                    f"  depended on by {os.path.join(self.content, 'index.md')} (unchanged)\n")
+        self.assertEqual(self.manifest["pages"][post]["assets"], {"/pic.png": "/pic.2.png"})
+
+    def test_template_assets_rebuild_every_page(self):
+        self.write(self.template, '<link href="/other.css">{{ Content }}')
+        self.build({"/pic.png": "/pic.1.png", "/other.css": "/other.1.css"})
+        generated, explained = self.build({"/pic.png": "/pic.1.png", "/other.css": "/other.2.css"})
+        self.assertEqual(len(generated), 2)
+        self.assertIn("build options or template assets changed", explained)
+
+
+if __name__ == "__main__":
+    unittest.main()
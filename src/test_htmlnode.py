@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -84,6 +85,35 @@ class TestHTMLNode(unittest.TestCase):
                    'text</a><i>italic text</i>Normal text</p>')
         self.assertEqual(node1.to_html(), result1)
 
+    def test_write_html_streams_chunks(self):
+        node1 = ParentNode(
+            "p",
+            [
+                LeafNode("Bold text", "b"),
+                ParentNode("a", [LeafNode("Nested", None)], {"href": "/"}),
+            ])
+        chunks = []
+        node1.write_html(chunks.append)
+        self.assertEqual(chunks, ['<p>', '<b>Bold text</b>', '<a href="/">', 'Nested', '</a>', '</p>'])
+        buffer = io.StringIO()
+        node1.write_html(buffer.write)
+        self.assertEqual(buffer.getvalue(), node1.to_html())
+
+    def test_write_html_raises_before_writing(self):
+        chunks = []
+        with self.assertRaises(ValueError):
+            ParentNode("p", []).write_html(chunks.append)
+        self.assertEqual(chunks, [])
+
+    def test_nodes_share_empty_props(self):
+        node1 = LeafNode("Plain text")
+        node2 = ParentNode("p", [node1])
+        self.assertIs(node1.props, node2.props)
+        self.assertEqual(node1.props_to_html(), "")
+        self.assertFalse(hasattr(node1, "__dict__"))
+        with self.assertRaises(TypeError):
+            node1.props["class"] = "leak"
+
 
 if __name__ == "__main__":
     unittest.main()
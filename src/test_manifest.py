@@ -0,0 +1,130 @@
+import os
+import tempfile
+import unittest
+
+from blocks import *
+from manifest import *
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "blog"))
+        self.write(self.template, "<title>{{ Title }}</title>{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "blog", "post.md"), "# Post")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def build(self, manifest):
+        return generate_pages_recursive(self.content, self.template, self.public, manifest)
+
+    def test_first_build_renders_everything(self):
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        generated = self.build(manifest)
+        self.assertEqual(sorted(generated), sorted([os.path.join(self.public, "index.html"),
+                                                    os.path.join(self.public, "blog", "post.html")]))
+        self.assertEqual(manifest["pages"][os.path.join(self.content, "index.md")]["output"], "index.html")
+
+    def test_unchanged_pages_are_skipped(self):
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        self.build(manifest)
+        self.assertEqual(self.build(manifest), [])
+        self.write(os.path.join(self.content, "index.md"), "# Home again")
+        self.assertEqual(self.build(manifest), [os.path.join(self.public, "index.html")])
+
+    def test_template_change_rerenders_all(self):
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        self.build(manifest)
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        self.assertEqual(len(self.build(manifest)), 2)
+
+    def test_toggling_minify_rerenders_all(self):
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        self.build(manifest)
+        generated = generate_pages_recursive(self.content, self.template, self.public, manifest, minify=True)
+        self.assertEqual(len(generated), 2)
+        self.assertEqual(generate_pages_recursive(self.content, self.template, self.public, manifest, minify=True), [])
+
+    def test_section_template_change_rerenders_section(self):
+        section_template = os.path.join(self.content, "blog", "_template.html")
+        self.write(section_template, "<article>{{ Content }}</article>")
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        self.build(manifest)
+        with open(os.path.join(self.public, "blog", "post.html")) as f:
+            self.assertEqual(f.read(), "<article><div><h1>Post</h1></div></article>")
+        self.write(section_template, "<section>{{ Content }}</section>")
+        self.assertEqual(self.build(manifest), [os.path.join(self.public, "blog", "post.html")])
+
+    def test_missing_output_is_regenerated(self):
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        self.build(manifest)
+        os.remove(os.path.join(self.public, "index.html"))
+        self.assertEqual(self.build(manifest), [os.path.join(self.public, "index.html")])
+
+    def test_deleted_source_removes_output(self):
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        self.build(manifest)
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.build(manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog", "post.html")))
+        self.assertNotIn(os.path.join(self.content, "blog", "post.md"), manifest["pages"])
+
+    def test_deleted_source_removes_compressed_siblings_and_empty_directories(self):
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        self.build(manifest)
+        for path in (os.path.join(self.public, "blog", "post.html.gz"), os.path.join(self.public, "index.html.gz")):
+            self.write(path, "compressed")
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        self.build(manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.public, "blog")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html.gz")))
+
+    def test_manifest_round_trip(self):
+        path = os.path.join(self.tmp.name, "manifest.json")
+        manifest = load_manifest(path)
+        self.build(manifest)
+        save_manifest(manifest, path)
+        self.assertEqual(load_manifest(path), manifest)
+
+    def test_parallel_build_matches_serial(self):
+        for i in range(6):
+            self.write(os.path.join(self.content, "blog", f"post{i}.md"), f"# Post {i}\n\nText *{i}*")
+        generate_pages_recursive(self.content, self.template, self.public)
+        serial = {}
+        for root, _, files in os.walk(self.public):
+            for name in files:
+                with open(os.path.join(root, name)) as f:
+                    serial[os.path.join(root, name)] = f.read()
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        generated = generate_pages_recursive(self.content, self.template, self.public, manifest, jobs=3)
+        self.assertEqual(sorted(generated), sorted(serial))
+        for path, html in serial.items():
+            with open(path) as f:
+                self.assertEqual(f.read(), html)
+
+    def test_errors_are_aggregated(self):
+        self.write(os.path.join(self.content, "bad.md"), "no title")
+        self.write(os.path.join(self.content, "blog", "worse.md"), "no title either")
+        manifest = load_manifest(os.path.join(self.tmp.name, "missing.json"))
+        with self.assertRaises(Exception) as context:
+            generate_pages_recursive(self.content, self.template, self.public, manifest, jobs=2)
+        message = str(context.exception)
+        self.assertIn("Failed to generate 2 of 4 pages", message)
+        self.assertIn("bad.md", message)
+        self.assertIn("worse.md", message)
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+        self.assertNotIn(os.path.join(self.content, "bad.md"), manifest["pages"])
+        self.assertIn(os.path.join(self.content, "index.md"), manifest["pages"])
+
+
+if __name__ == "__main__":
+    unittest.main()
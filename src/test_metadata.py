@@ -0,0 +1,169 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from blocks import *
+
+
+class TestFrontmatter(unittest.TestCase):
+    def test_split_frontmatter(self):
+        meta, body = split_frontmatter("---\ntitle: \"Hello: world\"\ndate: 2024-01-02\ndraft: false\n"
+                                       "weight: 3\ntags: [a, b]\nauthors:\n  - Ann\n  - Bo\n---\n\n# Body")
+        self.assertEqual(meta, {"title": "Hello: world", "date": "2024-01-02", "draft": False, "weight": 3,
+                                "tags": ["a", "b"], "authors": ["Ann", "Bo"]})
+        self.assertEqual(body, "# Body")
+        self.assertEqual(split_frontmatter("# Plain"), ({}, "# Plain"))
+
+    def test_whitespace_lines_after_the_fence(self):
+        markdown = "---\ntitle: x\n---\n  \n\t\n\n# Body\n\n  \ntext"
+        meta, body = split_frontmatter(markdown)
+        f = io.StringIO(markdown)
+        self.assertEqual(read_frontmatter(f), meta)
+        self.assertEqual(f.read(), body)
+        self.assertEqual(body, "# Body\n\n  \ntext")
+        extract_title(body)
+        self.assertEqual(split_frontmatter("---\ntitle: x\n---\n \n"), ({"title": "x"}, ""))
+
+    def test_invalid_frontmatter(self):
+        with self.assertRaises(ValueError):
+            split_frontmatter("---\nnot a pair\n---\n# Body")
+        with self.assertRaises(ValueError):
+            split_frontmatter("---\ntitle: x\n# Body")
+
+    def test_read_frontmatter_leaves_the_file_at_the_body(self):
+        f = io.StringIO("---\ntags: a, b\n---\n\n\n# Body\n\ntext")
+        self.assertEqual(page_tags(read_frontmatter(f)), ["a", "b"])
+        self.assertEqual(f.read(), "# Body\n\ntext")
+        f = io.StringIO("# Body")
+        self.assertEqual(read_frontmatter(f), {})
+        self.assertEqual(f.read(), "# Body")
+
+
+class TestMetadataIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "posts"))
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}{{ Pages }}{{ Tags }}{{ Related }}")
+        self.write(os.path.join(self.content, "posts", "index.md"), "---\nlist: true\n---\n# Posts")
+        self.post("one", "2024-01-01", "[python, web]")
+        self.post("two", "2024-02-01", "[python]")
+        self.post("three", "2024-03-01", "[cooking]")
+        self.manifest = {"pages": {}}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def read(self, *parts):
+        with open(os.path.join(self.public, *parts)) as f:
+            return f.read()
+
+    def post(self, name, date, tags, title=None):
+        title = f"title: {title}\n" if title else ""
+        self.write(os.path.join(self.content, "posts", f"{name}.md"),
+                   f"---\n{title}date: {date}\ntags: {tags}\n---\n# Post {name}\n\nBody")
+
+    def build(self):
+        return generate_pages_recursive(self.content, self.template, self.public, self.manifest)
+
+    def test_list_page_is_newest_first(self):
+        self.build()
+        self.assertEqual(self.read("posts", "index.html"),
+                         '<h1> Posts</h1><div><h1>Posts</h1></div><ul>'
+                         '<li><a href="/posts/three.html">Post three</a></li>'
+                         '<li><a href="/posts/two.html">Post two</a></li>'
+                         '<li><a href="/posts/one.html">Post one</a></li></ul>')
+
+    def test_tags_related_and_frontmatter_title(self):
+        self.post("two", "2024-02-01", "[python]", title="Second")
+        self.build()
+        page = self.read("posts", "one.html")
+        self.assertIn("<div><h1>Post one</h1><p>Body</p></div>", page)
+        self.assertIn('<a href="/tags/python/">python</a>, <a href="/tags/web/">web</a>', page)
+        self.assertTrue(page.endswith('<ul><li><a href="/posts/two.html">Second</a></li></ul>'))
+        self.assertTrue(self.read("posts", "two.html").startswith("<h1>Second</h1>"))
+        self.assertIn('<li><a href="/posts/one.html">Post one</a></li>', self.read("tags", "web", "index.html"))
+
+    def test_untouched_pages_are_not_reopened(self):
+        self.build()
+        record = self.manifest["metadata"][os.path.join(self.content, "posts", "one.md")]
+        record["meta"]["tags"] = ["cached"]
+        self.build()
+        self.assertTrue(os.path.exists(os.path.join(self.public, "tags", "cached", "index.html")))
+
+    def test_related_lists_are_only_ranked_again_when_a_tag_changes(self):
+        self.build()
+        one, two, three = (os.path.join(self.content, "posts", f"{name}.md") for name in ("one", "two", "three"))
+        self.assertEqual(self.manifest["metadata"][one]["related"], [two])
+        # A stale list that survives the next build proves nothing was ranked again
+        self.manifest["metadata"][one]["related"] = [three]
+        self.build()
+        self.assertIn('<a href="/posts/three.html">', self.read("posts", "one.html"))
+        self.post("four", "2024-04-01", "[web]")
+        self.build()
+        self.assertEqual(self.manifest["metadata"][one]["related"], [os.path.join(self.content, "posts", "four.md"),
+                                                                     two])
+        self.assertTrue(self.read("posts", "one.html").endswith('<ul><li><a href="/posts/four.html">Post four</a></li>'
+                                                                '<li><a href="/posts/two.html">Post two</a></li></ul>'))
+
+    def test_title_change_rebuilds_the_pages_listing_it(self):
+        self.build()
+        self.post("three", "2024-03-01", "[cooking]", title="Renamed")
+        rebuilt = self.build()
+        self.assertEqual(sorted(rebuilt), [os.path.join(self.public, "posts", name)
+                                           for name in ("index.html", "three.html")])
+        self.assertIn("Renamed", self.read("posts", "index.html"))
+
+    def test_stale_tag_pages_are_removed(self):
+        self.build()
+        self.post("three", "2024-03-01", "[]")
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.public, "tags", "cooking")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "tags", "python", "index.html")))
+
+    def test_tag_mates_are_explained_but_not_recorded(self):
+        self.build()
+        posts = os.path.join(self.content, "posts")
+        self.assertNotIn("depends", self.manifest["pages"][os.path.join(posts, "one.md")])
+        self.assertEqual(self.manifest["pages"][os.path.join(posts, "index.md")]["depends"],
+                         [os.path.join(posts, f"{name}.md") for name in ("one", "three", "two")])
+        self.post("two", "2024-02-01", "[python]", title="Second")
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            set_log_mode("quiet")
+            try:
+                generate_pages_recursive(self.content, self.template, self.public, self.manifest, explain=True)
+            finally:
+                set_log_mode("verbose")
+        self.assertIn(f"{os.path.join(posts, 'two.md')}: source changed\n"
+                      f"  depended on by {os.path.join(posts, 'index.md')} (rebuilt), "
+                      f"{os.path.join(posts, 'one.md')} (rebuilt)\n", out.getvalue())
+
+    def test_tag_slugs_keep_unicode_and_never_collide(self):
+        slugs = tag_slugs(["C++", "C#", "日本語", "русский", "+++"])
+        self.assertEqual(slugs["日本語"], "日本語")
+        self.assertEqual(slugs["русский"], "русский")
+        self.assertEqual(slugs["+++"], "tag")
+        self.assertEqual(sorted([slugs["C#"], slugs["C++"]]), ["c", "c-2"])
+        self.assertEqual(len(set(slugs.values())), len(slugs))
+
+    def test_colliding_tags_get_their_own_pages(self):
+        self.post("one", "2024-01-01", "[C++]")
+        self.post("two", "2024-02-01", "[C#]")
+        self.build()
+        self.assertIn('<a href="/tags/c-2/">C++</a>', self.read("posts", "one.html"))
+        self.assertIn('<a href="/tags/c/">C#</a>', self.read("posts", "two.html"))
+        self.assertIn("Post one", self.read("tags", "c-2", "index.html"))
+        self.assertNotIn("Post one", self.read("tags", "c", "index.html"))
+
+
+if __name__ == "__main__":
+    unittest.main()
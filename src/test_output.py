@@ -0,0 +1,108 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import output
+from output import *
+
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        set_log_mode("verbose")
+
+    def path(self, *parts):
+        return os.path.join(self.tmp.name, *parts)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_write_output_creates_directories(self):
+        path = self.path("a", "b", "index.html")
+        self.assertTrue(write_output(path, "<p>hi</p>", fsync=True))
+        self.assertEqual(self.read(path), "<p>hi</p>")
+        self.assertFalse(os.path.exists(f"{path}.tmp"))
+
+    def test_identical_output_is_not_rewritten(self):
+        path = self.path("index.html")
+        write_output(path, "same")
+        os.utime(path, ns=(1, 1))
+        self.assertFalse(write_output(path, "same"))
+        self.assertEqual(os.stat(path).st_mtime_ns, 1)
+        self.assertTrue(write_output(path, "diff"))
+        self.assertEqual(self.read(path), "diff")
+
+    def test_stream_output_writes_in_pieces(self):
+        path = self.path("index.html")
+        fill = lambda write: [write(piece) for piece in ("<p>", "héllo", "</p>")]
+        self.assertTrue(stream_output(path, fill))
+        os.utime(path, ns=(1, 1))
+        self.assertFalse(stream_output(path, fill))
+        self.assertEqual(os.stat(path).st_mtime_ns, 1)
+        self.assertEqual(self.read(path), "<p>héllo</p>")
+        self.assertEqual(os.listdir(self.tmp.name), ["index.html"])
+
+    def test_unchanged_output_is_only_read(self):
+        path = self.path("index.html")
+        write_output(path, "<p>same</p>")
+        original = output.atomic_write
+        output.atomic_write = None
+        try:
+            self.assertFalse(stream_output(path, lambda write: [write(piece) for piece in ("<p>", "same", "</p>")]))
+        finally:
+            output.atomic_write = original
+
+    def test_output_differing_part_way_through(self):
+        path = self.path("index.html")
+        for old, pieces in [("abcdef", ["abc", "xyz"]), ("abcdef", ["abc"]), ("abc", ["abc", "def"]),
+                            ("abc", ["", "abd"])]:
+            write_output(path, old)
+            self.assertTrue(stream_output(path, lambda write: [write(piece) for piece in pieces]))
+            self.assertEqual(self.read(path), "".join(pieces))
+            self.assertEqual(os.listdir(self.tmp.name), ["index.html"])
+
+    def test_make_dirs(self):
+        make_dirs([self.path("a", "1.html"), self.path("a", "2.html"), self.path("b", "c", "3.html")])
+        self.assertTrue(os.path.isdir(self.path("a")))
+        self.assertTrue(os.path.isdir(self.path("b", "c")))
+
+    def test_writer_reports_errors_by_path(self):
+        good = self.path("good.html")
+        bad = self.path("file", "bad.html")
+        with open(self.path("file"), 'w') as f:
+            f.write("not a directory")
+        writer = OutputWriter(threads=2, queue_limit=1)
+        writer.submit(good, lambda write: write("ok"))
+        writer.submit(bad, lambda write: write("nope"))
+        written, errors = writer.close()
+        self.assertEqual(written, 1)
+        self.assertEqual(list(errors), [bad])
+        self.assertEqual(self.read(good), "ok")
+
+    def test_log_modes(self):
+        with self.assertRaises(ValueError):
+            set_log_mode("loud")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            set_log_mode("quiet")
+            log("detail")
+            info("summary")
+            set_log_mode("progress")
+            log("detail")
+            info("summary")
+            progress = Progress(2)
+            progress.update()
+            progress.update()
+            progress.finish()
+        self.assertEqual(out.getvalue(), f"summary\n\r[{'#' * 15}{' ' * 15}] 1/2 pages"
+                                         f"\r[{'#' * 30}] 2/2 pages\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
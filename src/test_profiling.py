@@ -0,0 +1,47 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from blocks import *
+from profiling import *
+
+
+class TestProfiling(unittest.TestCase):
+    def test_record_and_slowest_pages(self):
+        profile = BuildProfile()
+        profile.record("read", 0.5, "a.md")
+        profile.record("write", 0.25, "a.md")
+        profile.merge_pages({"b.md": {"read": 1.0}})
+        profile.record("copy_static", 2.0)
+        self.assertEqual(profile.stages, {"read": 1.5, "write": 0.25, "copy_static": 2.0})
+        self.assertEqual(profile.slowest_pages(1), [(1.0, "b.md")])
+        self.assertEqual(profile.to_dict(5)["slowest"], [{"page": "b.md", "seconds": 1.0},
+                                                         {"page": "a.md", "seconds": 0.75}])
+        self.assertIn("Slowest 2 pages", profile.report(5))
+
+    def test_build_records_every_page_stage(self):
+        with tempfile.TemporaryDirectory() as root:
+            content = os.path.join(root, "content")
+            os.makedirs(content)
+            with open(os.path.join(content, "index.md"), 'w') as f:
+                f.write("# Home\n\nSome *text*")
+            template = os.path.join(root, "template.html")
+            with open(template, 'w') as f:
+                f.write("{{ Title }}{{ Content }}")
+            profile = BuildProfile()
+            with contextlib.redirect_stdout(io.StringIO()):
+                generate_pages_recursive(content, template, os.path.join(root, "public"), {"pages": {}},
+                                         profile=profile)
+            self.assertEqual(list(profile.pages[os.path.join(content, "index.md")]),
+                             ["read", "markdown_to_blocks", "markdown_to_html_node", "to_html", "template", "write"])
+            self.assertIn("discover", profile.stages)
+            self.assertIn("hash", profile.stages)
+            self.assertEqual(profile.counters["block_cache_hits"] + profile.counters["block_cache_misses"], 2)
+            with open(os.path.join(root, "public", "index.html")) as f:
+                self.assertEqual(f.read(), " Home\n\nSome *text*<div><h1>Home</h1><p>Some <i>text</i></p></div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import json
+import os
+import tempfile
+import unittest
+
+from blocks import *
+
+
+class TestSiteIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(os.path.join(self.content, "post"))
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome to the site")
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nA **bold** welcome & more")
+        self.manifest = {"pages": {}}
+        self.terms = SearchTerms(os.path.join(self.tmp.name, "cache", SEARCH_TERMS))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def load(self, *parts):
+        with open(os.path.join(self.public, *parts)) as f:
+            return f.read()
+
+    def build(self, **options):
+        return generate_pages_recursive(self.content, self.template, self.public, self.manifest,
+                                        search_terms=self.terms, **options)
+
+    def test_page_text_from_nodes_and_cached_html(self):
+        text = PageText()
+        text.add_content(markdown_to_html_node("Hello **World**\n\n- item"))
+        cached = PageText()
+        cached.add_content("<div><p>Hello <b>World</b></p><ul><li>item</li></ul></div>")
+        self.assertEqual(text.entry("# Title\n\nbody")["terms"], ["hello", "item", "world"])
+        self.assertEqual(text.entry(" Title\n\nbody")["title"], "Title")
+        self.assertEqual(cached.terms, text.terms)
+
+    def test_page_url(self):
+        self.assertEqual(page_url("index.html"), "/")
+        self.assertEqual(page_url(os.path.join("post", "index.html")), "/post/")
+        self.assertEqual(page_url("about.html"), "/about.html")
+
+    def test_search_index_is_sharded_by_term_prefix(self):
+        self.build(site_index=True)
+        listing = json.loads(self.load("search", "pages.json"))
+        self.assertEqual(listing, [["/", "Home"], ["/post/", "Post"]])
+        self.assertEqual(json.loads(self.load("search", "we.json")), {"welcome": [0, 1]})
+        self.assertEqual(json.loads(self.load("search", "bo.json")), {"bold": [1]})
+        self.assertIn(os.path.join("search", "we.json"), manifest_outputs(self.manifest))
+        self.assertFalse(os.path.exists(os.path.join(self.public, SITEMAP)))
+
+    def test_sitemap_and_feed(self):
+        self.build(base_url="https://example.com/")
+        sitemap = self.load(SITEMAP)
+        self.assertIn("<loc>https://example.com/</loc>", sitemap)
+        self.assertIn("<loc>https://example.com/post/</loc>", sitemap)
+        feed = self.load(FEED)
+        self.assertIn("<title>Home</title>", feed)
+        self.assertIn("<description>Post A bold welcome &amp; more</description>", feed)
+
+    def test_unchanged_pages_keep_their_index_data(self):
+        self.build(site_index=True)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nGoodbye")
+        self.assertEqual(self.build(site_index=True), [os.path.join(self.public, "index.html")])
+        self.assertEqual(json.loads(self.load("search", "we.json")), {"welcome": [1]})
+        self.assertEqual(json.loads(self.load("search", "go.json")), {"goodbye": [0]})
+
+    def test_terms_live_in_a_sidecar_and_only_changed_shards_are_written(self):
+        self.build(site_index=True)
+        self.assertNotIn("terms", self.manifest["pages"][os.path.join(self.content, "index.md")])
+        self.terms.save()
+        self.terms = SearchTerms(self.terms.path)
+        self.assertEqual(self.terms.pages[os.path.join(self.content, "index.md")]["we"], ["welcome"])
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome to my site")
+        self.build(site_index=True)
+        self.assertEqual(json.loads(self.load("search", "my.json")), {"my": [0]})
+        self.assertEqual(update_site_indexes(self.manifest, self.public, True, None, self.terms), [])
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\nWelcome to your site")
+        self.build(site_index=True)
+        self.assertEqual(update_site_indexes(self.manifest, self.public, True, None, self.terms), [])
+        self.assertFalse(os.path.exists(os.path.join(self.public, SEARCH_DIR, "my.json")))
+        self.assertEqual(json.loads(self.load("search", "yo.json")), {"your": [0]})
+
+    def test_search_terms_track_changed_shards(self):
+        terms = SearchTerms()
+        terms.update("a.md", ["apple", "banana"])
+        terms.update("b.md", ["apricot"])
+        self.assertEqual(terms.take_dirty(["a.md", "b.md"]), {"ap", "ba"})
+        terms.update("a.md", ["apple", "banana"])
+        terms.update("b.md", ["apricot", "cherry"])
+        self.assertEqual(terms.take_dirty(["a.md", "b.md"]), {"ch"})
+        self.assertEqual(terms.shard_terms("ap", {"a.md": 0, "b.md": 1}), {"apple": [0], "apricot": [1]})
+        terms.remove("a.md")
+        self.assertEqual(terms.take_dirty(["b.md"]), {"ap", "ch"})
+        self.assertEqual(sorted(terms.shard_pages), ["ap", "ch"])
+        terms.update("b.md", ["cherry"])
+        self.assertEqual(terms.take_dirty(["b.md"]), {"ap"})
+        self.assertEqual(sorted(terms.shard_pages), ["ch"])
+
+    def test_terms_saved_with_another_manifest_are_dropped(self):
+        self.build(site_index=True)
+        self.manifest["search_terms"] = "other"
+        self.assertEqual(len(self.build(site_index=True)), 2)
+        self.assertEqual(json.loads(self.load("search", "we.json")), {"welcome": [0, 1]})
+
+    def test_stale_shards_go_but_other_files_stay(self):
+        os.makedirs(os.path.join(self.public, SEARCH_DIR))
+        self.write(os.path.join(self.public, SEARCH_DIR, "synonyms.json"), "{}")
+        self.build(site_index=True)
+        self.write(os.path.join(self.content, "post", "index.md"), "# Post\n\nNothing")
+        self.build(site_index=True)
+        self.assertFalse(os.path.exists(os.path.join(self.public, SEARCH_DIR, "bo.json")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, SEARCH_DIR, "synonyms.json")))
+        self.build()
+        self.assertTrue(os.path.exists(os.path.join(self.public, SEARCH_DIR, "synonyms.json")))
+        self.assertFalse(os.path.exists(os.path.join(self.public, SEARCH_DIR, "pages.json")))
+
+    def test_switching_the_index_off_removes_it(self):
+        self.build(base_url="https://example.com/")
+        self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.public, SEARCH_DIR)))
+        self.assertFalse(os.path.exists(os.path.join(self.public, FEED)))
+        self.assertNotIn("indexes", self.manifest)
+
+
+if __name__ == "__main__":
+    unittest.main()
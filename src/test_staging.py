@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+
+from staging import *
+from utility import atomic_write
+
+
+class TestStaging(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.public = os.path.join(self.tmp.name, "public")
+        self.builds = os.path.join(self.tmp.name, "builds")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with atomic_write(path) as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def build(self, text, keep=KEEP_BUILDS):
+        staging, _ = stage_build(self.public, self.builds)
+        self.write(os.path.join(staging, "index.html"), text)
+        publish_build(staging, self.public, self.builds, keep)
+        return staging
+
+    def test_first_build_is_published_through_a_symlink(self):
+        staging = self.build("one")
+        self.assertTrue(os.path.islink(self.public))
+        self.assertEqual(current_build(self.public, self.builds), staging)
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "one")
+
+    def test_existing_public_dir_is_adopted(self):
+        self.write(os.path.join(self.public, "old.html"), "old")
+        staging, previous = stage_build(self.public, self.builds)
+        self.assertIsNotNone(previous)
+        self.assertEqual(self.read(os.path.join(staging, "old.html")), "old")
+        self.assertEqual(self.read(os.path.join(self.public, "old.html")), "old")
+
+    def test_unchanged_files_are_hard_linked_and_changes_stay_in_the_new_build(self):
+        first = self.build("one")
+        self.write(os.path.join(first, "style.css"), "css")
+        staging, previous = stage_build(self.public, self.builds)
+        self.assertEqual(previous, first)
+        self.assertTrue(os.path.samefile(os.path.join(first, "style.css"), os.path.join(staging, "style.css")))
+        self.write(os.path.join(staging, "index.html"), "two")
+        self.assertEqual(self.read(os.path.join(first, "index.html")), "one")
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "one")
+        publish_build(staging, self.public, self.builds)
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "two")
+
+    def test_clean_stage_starts_empty(self):
+        self.build("one")
+        staging, _ = stage_build(self.public, self.builds, clean=True)
+        self.assertEqual(os.listdir(staging), [])
+
+    def test_rollback(self):
+        first = self.build("one")
+        self.build("two")
+        self.assertEqual(rollback(self.public, self.builds), first)
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "one")
+        with self.assertRaises(Exception) as context:
+            rollback(self.public, self.builds)
+        self.assertEqual(str(context.exception), "No earlier build to roll back to")
+
+    def test_old_builds_are_pruned(self):
+        builds = [self.build(str(i), keep=2) for i in range(4)]
+        self.assertEqual(list_builds(self.builds), [os.path.basename(build) for build in builds[2:]])
+
+    def test_discarded_build_leaves_public_alone(self):
+        first = self.build("one")
+        staging, _ = stage_build(self.public, self.builds)
+        discard_build(staging)
+        self.assertFalse(os.path.exists(staging))
+        self.assertEqual(current_build(self.public, self.builds), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
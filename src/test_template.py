@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+
+from htmlnode import LeafNode, ParentNode
+from template import *
+
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        clear_template_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def test_compile_template(self):
+        parts = compile_template("<title>{{ Title }}</title>{{Content}}")
+        self.assertEqual(parts, ["<title>", ("Title", "{{ Title }}"), "</title>", ("Content", "{{Content}}"), ""])
+        self.assertEqual(compile_template("no slots"), ["no slots"])
+
+    def test_render_template(self):
+        parts = compile_template("<title>{{ Title }}</title>{{ Content }}{{ Author }}{{ Unknown }}")
+        values = {"Title": "Hi", "Content": ParentNode("p", [LeafNode("text")]), "Author": "Olli"}
+        self.assertEqual(render_template(parts, values), "<title>Hi</title><p>text</p>Olli{{ Unknown }}")
+
+    def test_load_template_is_cached_until_modified(self):
+        path = os.path.join(self.tmp.name, "template.html")
+        self.write(path, "{{ Title }}")
+        parts = load_template(path)
+        self.assertIs(load_template(path), parts)
+        self.write(path, "<h1>{{ Title }}</h1>")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(load_template(path), ["<h1>", ("Title", "{{ Title }}"), "</h1>"])
+
+    def test_minify_html(self):
+        html = "<html>\n  <head>\n    <title> {{ Title }} </title>\n  </head>\n  <!-- nav -->\n  <p>a  <b>b</b>\n <i>c</i></p>\n</html>\n"
+        self.assertEqual(minify_html(html),
+                         "<html><head><title>{{ Title }}</title></head><p>a <b>b</b> <i>c</i></p></html>")
+
+    def test_minify_html_keeps_preformatted_content(self):
+        html = "<div>\n  <pre><code>x  =  1\n  y</code></pre>\n  <p><code> a  b </code></p>\n</div>"
+        self.assertEqual(minify_html(html), "<div><pre><code>x  =  1\n  y</code></pre><p><code> a  b </code></p></div>")
+
+    def test_minified_template(self):
+        path = os.path.join(self.tmp.name, "template.html")
+        self.write(path, "<body>\n    {{ Content }}\n</body>\n")
+        self.assertEqual(load_template(path, minify=True), ["<body>", ("Content", "{{ Content }}"), "</body>"])
+        self.assertEqual(load_template(path)[0], "<body>\n    ")
+        self.assertEqual(minified_savings(path), 7)
+
+    def test_find_template(self):
+        content = os.path.join(self.tmp.name, "content")
+        default = os.path.join(self.tmp.name, "template.html")
+        blog_template = os.path.join(content, "blog", SECTION_TEMPLATE)
+        self.write(blog_template, "{{ Content }}")
+        self.write(os.path.join(content, "index.md"), "# Home")
+        self.write(os.path.join(content, "blog", "2024", "post.md"), "# Post")
+        self.assertEqual(find_template(os.path.join(content, "index.md"), content, default), default)
+        self.assertEqual(find_template(os.path.join(content, "blog", "2024", "post.md"), content, default),
+                         blog_template)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 
 from utility import *
+from benchmark import chained_text_to_text_nodes, generate_inline_text
 
 
 class TestTextNode(unittest.TestCase):
@@ -188,6 +189,20 @@ class TestTextNode(unittest.TestCase):
         ]
         self.assertEqual(split_nodes_link(node1), result1)
 
+    def test_split_links_uses_match_offsets(self):
+        node1 = [TextNode("![same](url) and [same](url)", TextType.TEXT)]
+        result1 = [
+            TextNode("![same](url) and ", TextType.TEXT),
+            TextNode("same", TextType.LINK, "url"),
+        ]
+        self.assertEqual(split_nodes_link(node1), result1)
+
+    def test_split_many_links(self):
+        node1 = [TextNode(" ".join(f"[{i}](/{i})" for i in range(10000)), TextType.TEXT)]
+        result1 = split_nodes_link(node1)
+        self.assertEqual(len(result1), 19999)
+        self.assertEqual(result1[-1], TextNode("9999", TextType.LINK, "/9999"))
+
     def test_text_to_textnodes(self):
         node1 = ("This is **text** with an *italic* word and a `code block` and an ![image]("
                  "https://storage.googleapis.com/qvault-webapp-dynamic-assets/course_assets/zjjcJKZ.png) and a ["
@@ -207,6 +222,30 @@ class TestTextNode(unittest.TestCase):
         ]
         self.assertEqual(text_to_textnodes(node1), result1)
 
+    def test_text_to_text_nodes_matches_chained_passes(self):
+        texts = [
+            "This is **text** with an *italic* word and a `code block` and an ![image](/a.png) and a [link](/b)",
+            "**bold with [a link](/x)** and `plain code` then ![](/empty-alt.png) and [](/empty)",
+            "**`x`** *`y`* a****b",
+            "![image1](url1)a![image2](url2)[link](url3)",
+            "",
+            generate_inline_text(500),
+        ]
+        for text in texts:
+            self.assertEqual(text_to_text_nodes(text), chained_text_to_text_nodes(text))
+
+    def test_text_to_text_nodes_unclosed_delimiters(self):
+        cases = [
+            ("**bold", TextType.BOLD),
+            ("*italic **bold**", TextType.ITALIC),
+            ("`code` `unclosed *a* *b", TextType.ITALIC),
+            ("`code *a*", TextType.CODE),
+        ]
+        for text, text_type in cases:
+            with self.assertRaises(ValueError) as context:
+                text_to_text_nodes(text)
+            self.assertEqual(str(context.exception), f"No closing {text_type} delimiter")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,89 @@
+import os
+import tempfile
+import time
+import unittest
+
+from utility import *
+
+
+class TestSyncDir(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        os.makedirs(os.path.join(self.static, "images"))
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.write(os.path.join(self.static, "images", "a.png"), "png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def test_first_sync_copies_everything(self):
+        copied, removed = sync_dir_to_new_dir(self.static, self.public)
+        self.assertEqual(sorted(copied), [os.path.join(self.public, "images", "a.png"),
+                                          os.path.join(self.public, "index.css")])
+        self.assertEqual(removed, [])
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body {}")
+
+    def test_unchanged_files_are_skipped(self):
+        sync_dir_to_new_dir(self.static, self.public)
+        self.assertEqual(sync_dir_to_new_dir(self.static, self.public), ([], []))
+
+    def test_changed_file_is_recopied(self):
+        sync_dir_to_new_dir(self.static, self.public)
+        path = os.path.join(self.static, "index.css")
+        self.write(path, "body { color: red; }")
+        copied, _ = sync_dir_to_new_dir(self.static, self.public)
+        self.assertEqual(copied, [os.path.join(self.public, "index.css")])
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body { color: red; }")
+
+    def test_checksum_ignores_touched_files(self):
+        sync_dir_to_new_dir(self.static, self.public)
+        path = os.path.join(self.static, "index.css")
+        os.utime(path, (time.time() + 10, time.time() + 10))
+        self.assertEqual(sync_dir_to_new_dir(self.static, self.public, checksum=True), ([], []))
+
+    def test_stale_files_are_removed_but_kept_files_survive(self):
+        sync_dir_to_new_dir(self.static, self.public)
+        self.write(os.path.join(self.public, "index.html"), "<html></html>")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        _, removed = sync_dir_to_new_dir(self.static, self.public, keep={"index.html"})
+        self.assertEqual(removed, [os.path.join(self.public, "images", "a.png")])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "images")))
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.html")))
+
+    def test_compressed_siblings_follow_their_source(self):
+        sync_dir_to_new_dir(self.static, self.public)
+        self.write(os.path.join(self.public, "index.css.gz"), "gz")
+        self.write(os.path.join(self.public, "images", "a.png.gz"), "gz")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        _, removed = sync_dir_to_new_dir(self.static, self.public)
+        self.assertTrue(os.path.exists(os.path.join(self.public, "index.css.gz")))
+        self.assertEqual(sorted(removed), [os.path.join(self.public, "images", "a.png"),
+                                           os.path.join(self.public, "images", "a.png.gz")])
+
+    def test_hardlink_mode(self):
+        sync_dir_to_new_dir(self.static, self.public, link="hardlink")
+        self.assertTrue(os.path.samefile(os.path.join(self.static, "index.css"),
+                                         os.path.join(self.public, "index.css")))
+
+    def test_reflink_mode_falls_back_to_copy(self):
+        sync_dir_to_new_dir(self.static, self.public, link="reflink")
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body {}")
+
+    def test_invalid_link_mode(self):
+        with self.assertRaises(ValueError) as context:
+            sync_dir_to_new_dir(self.static, self.public, link="symlink")
+        self.assertEqual(str(context.exception), "Invalid link mode symlink")
+
+
+if __name__ == "__main__":
+    unittest.main()
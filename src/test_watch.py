@@ -0,0 +1,116 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from watch import *
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.content = os.path.join(self.tmp.name, "content")
+        self.static = os.path.join(self.tmp.name, "static")
+        self.public = os.path.join(self.tmp.name, "public")
+        self.template = os.path.join(self.tmp.name, "template.html")
+        os.makedirs(self.content)
+        os.makedirs(self.static)
+        self.write(self.template, "{{ Content }}")
+        self.write(os.path.join(self.content, "index.md"), "# Home")
+        self.write(os.path.join(self.content, "other.md"), "# Other")
+        self.write(os.path.join(self.static, "index.css"), "body {}")
+        self.manifest = {"pages": {}}
+        with contextlib.redirect_stdout(io.StringIO()):
+            sync_dir_to_new_dir(self.static, self.public)
+            generate_pages_recursive(self.content, self.template, self.public, self.manifest)
+        self.watched = [self.content, self.static, self.template]
+        self.before = snapshot(self.watched)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, path, text):
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def read(self, path):
+        with open(path) as f:
+            return f.read()
+
+    def rebuild(self):
+        changed, removed = diff_snapshots(self.before, snapshot(self.watched))
+        with contextlib.redirect_stdout(io.StringIO()):
+            return rebuild_changes(changed, removed, self.content, self.template, self.static, self.public,
+                                   self.manifest)
+
+    def test_snapshot_diff(self):
+        self.write(os.path.join(self.content, "new.md"), "# New")
+        os.remove(os.path.join(self.static, "index.css"))
+        changed, removed = diff_snapshots(self.before, snapshot(self.watched))
+        self.assertEqual(changed, {os.path.join(self.content, "new.md")})
+        self.assertEqual(removed, {os.path.join(self.static, "index.css")})
+
+    def test_page_edit_rebuilds_only_that_page(self):
+        self.write(os.path.join(self.content, "index.md"), "# Home edited")
+        rebuilt, errors = self.rebuild()
+        self.assertEqual(rebuilt, [os.path.join(self.public, "index.html")])
+        self.assertEqual(errors, [])
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")), "<div><h1>Home edited</h1></div>")
+
+    def test_title_edit_rebuilds_the_list_page(self):
+        self.write(self.template, "{{ Content }}{{ Pages }}")
+        self.write(os.path.join(self.content, "index.md"), "---\nlist: true\n---\n# Home")
+        self.rebuild()
+        self.before = snapshot(self.watched)
+        self.write(os.path.join(self.content, "other.md"), "# Renamed")
+        rebuilt, errors = self.rebuild()
+        self.assertEqual(sorted(rebuilt), [os.path.join(self.public, "index.html"),
+                                           os.path.join(self.public, "other.html")])
+        self.assertEqual(self.read(os.path.join(self.public, "index.html")),
+                         '<div><h1>Home</h1></div><ul><li><a href="/other.html">Renamed</a></li></ul>')
+
+    def test_removed_page_removes_output(self):
+        os.remove(os.path.join(self.content, "other.md"))
+        rebuilt, _ = self.rebuild()
+        self.assertEqual(rebuilt, [os.path.join(self.public, "other.html")])
+        self.assertFalse(os.path.exists(os.path.join(self.public, "other.html")))
+
+    def test_template_edit_rebuilds_every_page(self):
+        self.write(self.template, "<main>{{ Content }}</main>")
+        rebuilt, _ = self.rebuild()
+        self.assertEqual(len(rebuilt), 2)
+
+    def test_static_changes_are_mirrored(self):
+        self.write(os.path.join(self.static, "index.css"), "body { margin: 0; }")
+        self.write(os.path.join(self.static, "extra.css"), "p {}")
+        rebuilt, _ = self.rebuild()
+        self.assertEqual(sorted(rebuilt), [os.path.join(self.public, "extra.css"),
+                                           os.path.join(self.public, "index.css")])
+        self.assertEqual(self.read(os.path.join(self.public, "index.css")), "body { margin: 0; }")
+
+    def test_fingerprinted_asset_change_rebuilds_pages(self):
+        self.write(self.template, '<link href="/index.css">{{ Content }}')
+        assets = fingerprint_dir_to_new_dir(self.static, self.public)
+        with contextlib.redirect_stdout(io.StringIO()):
+            generate_pages_recursive(self.content, self.template, self.public, self.manifest, assets=assets)
+        self.before = snapshot(self.watched)
+        self.write(os.path.join(self.static, "index.css"), "body { margin: 0; }")
+        changed, removed = diff_snapshots(self.before, snapshot(self.watched))
+        with contextlib.redirect_stdout(io.StringIO()):
+            rebuilt, errors = rebuild_changes(changed, removed, self.content, self.template, self.static,
+                                              self.public, self.manifest, assets=assets)
+        self.assertEqual(errors, [])
+        self.assertIn(os.path.join(self.public, "index.html"), rebuilt)
+        self.assertIn(f'href="{assets["/index.css"]}"', self.read(os.path.join(self.public, "index.html")))
+        self.assertEqual(self.read(os.path.join(self.public, assets["/index.css"][1:])), "body { margin: 0; }")
+
+    def test_bad_page_is_reported(self):
+        self.write(os.path.join(self.content, "index.md"), "no title")
+        rebuilt, errors = self.rebuild()
+        self.assertEqual(rebuilt, [])
+        self.assertEqual(len(errors), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
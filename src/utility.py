@@ -1,5 +1,12 @@
+import hashlib
 import os
 import shutil
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 from htmlnode import *
 from textnode import *
@@ -7,6 +14,12 @@ from enum import Enum
 import re
 
 VALID_DELIMITERS = {'`', '*', '**'}
+LINK_MODES = {"copy", "hardlink", "reflink"}
+FICLONE = 0x40049409
+COMPRESSED_SUFFIXES = (".gz", ".br", ".zst")
+DELIMITER_RE = re.compile(r"\*\*|\*|`")
+IMAGE_RE = re.compile(r"!\[(.*?)\]\((.*?)\)")
+LINK_RE = re.compile(r"(?<!!)\[(.*?)\]\((.*?)\)")
 
 
 class TextType(Enum):
@@ -19,15 +32,74 @@ class TextType(Enum):
 
 
 def text_to_text_nodes(text):
-    nodes = [TextNode(text, TextType.TEXT)]
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "*", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    nodes = split_nodes_image(nodes)
-    nodes = split_nodes_link(nodes)
+    # Single scan equivalent to running split_nodes_delimiter for "**", "*" and "`",
+    # then split_nodes_image and split_nodes_link, without rebuilding the node list five times
+    if text.count("**") % 2:
+        raise ValueError(f"No closing {TextType.BOLD} delimiter")
+    nodes = []
+    bold = italic = code = False
+    code_error = None
+    start = 0
+    for match in DELIMITER_RE.finditer(text):
+        delimiter = match.group()
+        if bold:
+            if delimiter == "**":
+                split_nodes_inline(text[start:match.start()], TextType.BOLD, nodes)
+                bold = False
+                start = match.end()
+            continue
+        if delimiter == "**":
+            if italic:
+                raise ValueError(f"No closing {TextType.ITALIC} delimiter")
+            if code and code_error is None:
+                code_error = ValueError(f"No closing {TextType.CODE} delimiter")
+            split_nodes_inline(text[start:match.start()], TextType.TEXT, nodes)
+            bold = True
+            code = False
+            start = match.end()
+        elif delimiter == "*":
+            if italic:
+                split_nodes_inline(text[start:match.start()], TextType.ITALIC, nodes)
+            else:
+                if code and code_error is None:
+                    code_error = ValueError(f"No closing {TextType.CODE} delimiter")
+                split_nodes_inline(text[start:match.start()], TextType.TEXT, nodes)
+                code = False
+            italic = not italic
+            start = match.end()
+        elif not italic:
+            split_nodes_inline(text[start:match.start()], TextType.CODE if code else TextType.TEXT, nodes)
+            code = not code
+            start = match.end()
+    if italic:
+        raise ValueError(f"No closing {TextType.ITALIC} delimiter")
+    if code and code_error is None:
+        code_error = ValueError(f"No closing {TextType.CODE} delimiter")
+    # The chained passes only report an unclosed code span once every italic span checked out
+    if code_error is not None:
+        raise code_error
+    split_nodes_inline(text[start:], TextType.TEXT, nodes)
     return nodes
 
 
+def split_nodes_inline(text, text_type, nodes):
+    if not text:
+        return
+    if "[" not in text:
+        nodes.append(TextNode(text, text_type))
+        return
+    start = 0
+    for match in IMAGE_RE.finditer(text):
+        if match.start() > start:
+            split_node_on_pattern(TextNode(text[start:match.start()], TextType.TEXT), LINK_RE, TextType.LINK, nodes)
+        split_node_on_pattern(TextNode(match.group(1), TextType.IMAGE, match.group(2)), LINK_RE, TextType.LINK, nodes)
+        start = match.end()
+    if start == 0:
+        split_node_on_pattern(TextNode(text, text_type), LINK_RE, TextType.LINK, nodes)
+    elif start < len(text):
+        split_node_on_pattern(TextNode(text[start:], TextType.TEXT), LINK_RE, TextType.LINK, nodes)
+
+
 def text_node_to_html_node(text_node):
     match text_node.text_type:
         case TextType.TEXT:
@@ -69,7 +141,7 @@ def split_nodes_delimiter(old_nodes, delimiter, text_type: TextType):
 
 def extract_markdown_images(text):
     content = []
-    matches = re.findall(r"!\[(.*?)\]\((.*?)\)", text)
+    matches = IMAGE_RE.findall(text)
     for match in matches:
         content.append(match)
     return content
@@ -77,7 +149,7 @@ def extract_markdown_images(text):
 
 def extract_markdown_links(text):
     content = []
-    matches = re.findall(r"(?<!!)\[(.*?)\]\((.*?)\)", text)
+    matches = LINK_RE.findall(text)
     for match in matches:
         content.append(match)
     return content
@@ -86,48 +158,41 @@ def extract_markdown_links(text):
 def split_nodes_image(old_nodes):
     new_nodes = []
     for node in old_nodes:
-        text = node.text
-        image_tuples = extract_markdown_images(text)
-        if not image_tuples:
-            if text != "":
-                new_nodes.append(node)
-        else:
-            for image_tup in image_tuples:
-                split_node = text.split(f"![{image_tup[0]}]({image_tup[1]})", 1)
-                if split_node[0] != "":
-                    new_nodes.append(TextNode(split_node[0], TextType.TEXT))
-                new_nodes.append(TextNode(image_tup[0], TextType.IMAGE, image_tup[1]))
-                text = split_node[1]
-            if text != '':
-                new_nodes.append(TextNode(text, TextType.TEXT))
+        split_node_on_pattern(node, IMAGE_RE, TextType.IMAGE, new_nodes)
     return new_nodes
 
 
 def split_nodes_link(old_nodes):
     new_nodes = []
     for node in old_nodes:
-        text = node.text
-        link_tuples = extract_markdown_links(text)
-        if not link_tuples:
-            if text != "":
-                new_nodes.append(node)
-        else:
-            for link_tup in link_tuples:
-                split_node = text.split(f"[{link_tup[0]}]({link_tup[1]})", 1)
-                if split_node[0] != "":
-                    new_nodes.append(TextNode(split_node[0], TextType.TEXT))
-                new_nodes.append(TextNode(link_tup[0], TextType.LINK, link_tup[1]))
-                text = split_node[1]
-            if text != '':
-                new_nodes.append(TextNode(text, TextType.TEXT))
+        split_node_on_pattern(node, LINK_RE, TextType.LINK, new_nodes)
     return new_nodes
 
 
+def split_node_on_pattern(node, pattern, text_type, new_nodes):
+    # Slicing at match offsets keeps this linear, rescanning the remainder after every match was quadratic
+    text = node.text
+    start = 0
+    for match in pattern.finditer(text):
+        if match.start() > start:
+            new_nodes.append(TextNode(text[start:match.start()], TextType.TEXT))
+        new_nodes.append(TextNode(match.group(1), text_type, match.group(2)))
+        start = match.end()
+    if start == 0:
+        if text != "":
+            new_nodes.append(node)
+    elif start < len(text):
+        new_nodes.append(TextNode(text[start:], TextType.TEXT))
+
+
 def copy_dir_to_new_dir(old, new):
     if not os.path.exists(old):
         print("path doesn't exist")
         return None
-    if os.path.exists(new):
+    if os.path.islink(new):
+        # A public/ left pointing at a staged build goes back to being a plain directory
+        os.remove(new)
+    elif os.path.exists(new):
         shutil.rmtree(new)
     os.mkdir(new)
     entries = os.listdir(old)
@@ -141,6 +206,118 @@ def copy_dir_to_new_dir(old, new):
             copy_dir_to_new_dir(path, new_path)
 
 
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def files_match(src, dest, checksum=False):
+    try:
+        dest_stat = os.stat(dest)
+    except FileNotFoundError:
+        return False
+    src_stat = os.stat(src)
+    if src_stat.st_size != dest_stat.st_size:
+        return False
+    if checksum:
+        return hash_file(src) == hash_file(dest)
+    return src_stat.st_mtime_ns == dest_stat.st_mtime_ns
+
+
+def reflink_file(src, dest):
+    if fcntl is None:
+        raise OSError("reflinks are not supported on this platform")
+    with open(src, 'rb') as src_file, open(dest, 'wb') as dest_file:
+        fcntl.ioctl(dest_file.fileno(), FICLONE, src_file.fileno())
+    shutil.copystat(src, dest)
+
+
+def copy_file(src, dest, link="copy"):
+    if link not in LINK_MODES:
+        raise ValueError(f"Invalid link mode {link}")
+    # Files are staged next to the destination and renamed over it, so readers never see a partial file
+    tmp_path = f"{dest}.tmp"
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        if link == "hardlink":
+            os.link(src, tmp_path)
+        elif link == "reflink":
+            reflink_file(src, tmp_path)
+        else:
+            shutil.copy2(src, tmp_path)
+    except OSError:
+        if link == "copy":
+            raise
+        # Cross-device links and filesystems without reflink support fall back to a plain copy
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        shutil.copy2(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+
+def remove_stale_files(root, expected):
+    removed = []
+    for dir_path, dir_names, file_names in os.walk(root, topdown=False):
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            rel_path = os.path.relpath(path, root)
+            base, extension = os.path.splitext(rel_path)
+            # Precompressed siblings live and die with the file they were made from
+            if rel_path in expected or (extension in COMPRESSED_SUFFIXES and base in expected):
+                continue
+            os.remove(path)
+            removed.append(path)
+        if dir_path != root and not os.listdir(dir_path):
+            os.rmdir(dir_path)
+    return removed
+
+
+def sync_dir_to_new_dir(old, new, link="copy", checksum=False, keep=(), rename=None):
+    if not os.path.exists(old):
+        print("path doesn't exist")
+        return None
+    expected = {}
+    for dir_path, _, file_names in os.walk(old):
+        for name in file_names:
+            path = os.path.join(dir_path, name)
+            rel_path = os.path.relpath(path, old)
+            expected[rename(rel_path, path) if rename else rel_path] = path
+
+    copied = []
+    created_dirs = set()
+    for rel_path, src in sorted(expected.items()):
+        dest = os.path.join(new, rel_path)
+        if files_match(src, dest, checksum):
+            continue
+        dest_dir = os.path.dirname(dest)
+        if dest_dir not in created_dirs:
+            os.makedirs(dest_dir, exist_ok=True)
+            created_dirs.add(dest_dir)
+        if os.path.isdir(dest):
+            shutil.rmtree(dest)
+        copy_file(src, dest, link)
+        copied.append(dest)
+    removed = remove_stale_files(new, set(expected) | {os.path.normpath(path) for path in keep})
+    return copied, removed
+
+
+@contextmanager
+def atomic_write(path, mode='w', suffix=".tmp"):
+    # Writers that may race on the same path pass a suffix of their own so they don't share the tmp file
+    tmp_path = f"{path}{suffix}"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def extract_title(markdown):
     if not markdown.startswith('#'):
         raise Exception("No h1 header in markdown")
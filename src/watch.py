@@ -0,0 +1,146 @@
+import os
+import subprocess
+import sys
+import time
+
+from blocks import *
+from manifest import *
+from template import SECTION_TEMPLATE
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server.py")
+
+
+def snapshot(paths):
+    files = {}
+    stack = list(paths)
+    while stack:
+        path = stack.pop()
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+            continue
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def diff_snapshots(old, new):
+    changed = {path for path, stamp in new.items() if old.get(path) != stamp}
+    removed = set(old) - set(new)
+    return changed, removed
+
+
+def is_within(path, directory):
+    return os.path.commonpath([os.path.abspath(path), os.path.abspath(directory)]) == os.path.abspath(directory)
+
+
+def rebuild_changes(changed, removed, content_dir, template_path, static_dir, dest_dir, manifest, minify=False,
+                    assets=None, cache_dir=None, fsync=False, site_index=False, base_url=None, explain=False,
+                    search_terms=None):
+    touched = changed | removed
+    rebuilt = []
+    errors = []
+    indexing = site_index or bool(base_url)
+    static_touched = sorted(path for path in touched if is_within(path, static_dir))
+    rebuild_all = any(path == template_path or os.path.basename(path) == SECTION_TEMPLATE for path in touched)
+    # Without the terms of the pages that aren't touched, the search index can only be redone from every page
+    rebuild_all = rebuild_all or (indexing and search_terms is None and bool(touched - set(static_touched)))
+    if assets is not None and static_touched:
+        # Fingerprinted names follow the content, so the asset map is redone and pages pick up the new URLs
+        fingerprinted = fingerprint_dir_to_new_dir(static_dir, dest_dir, keep=manifest_outputs(manifest),
+                                                   digests=manifest.setdefault("asset_digests", {}))
+        rebuild_all = rebuild_all or fingerprinted != assets
+        assets.clear()
+        assets.update(fingerprinted)
+        rebuilt.extend(os.path.join(dest_dir, url.lstrip("/")) for url in sorted(assets.values()))
+        static_touched = []
+
+    if rebuild_all:
+        # Any template edit can affect pages anywhere, the manifest narrows it to the pages using that template
+        try:
+            rebuilt.extend(generate_pages_recursive(content_dir, template_path, dest_dir, manifest,
+                                                     minify=minify, assets=assets, cache_dir=cache_dir,
+                                                     fsync=fsync, site_index=site_index, base_url=base_url,
+                                                     explain=explain, search_terms=search_terms))
+        except Exception as e:
+            errors.append(str(e))
+    else:
+        edited = {path for path in changed if path.endswith('.md') and is_within(path, content_dir)}
+        gone = {path for path in removed if path.endswith('.md') and is_within(path, content_dir)}
+        if edited or gone:
+            # The metadata index covers every page, it picks out the ones whose lists, tags or related pages moved
+            sources = sorted((set(manifest["pages"]) | edited) - gone)
+            known = [(path, find_template(path, content_dir, template_path),
+                      page_output_path(path, content_dir, dest_dir)) for path in sources]
+            records, outputs, variables, depends = index_pages(known, content_dir, dest_dir, manifest)
+            recorded = {path: entry.get("variables", "") for path, entry in manifest["pages"].items()}
+            pages = [page for page in known
+                     if page[0] in edited or variables_digest(variables.get(page[0])) != recorded.get(page[0], "")]
+            generated, page_errors = generate_pages(pages, dest_dir, manifest, minify=minify, assets=assets,
+                                                    cache_dir=cache_dir, fsync=fsync,
+                                                    site_index=indexing, variables=variables, explain=explain,
+                                                    search_terms=search_terms)
+            rebuilt.extend(generated)
+            errors.extend(f"{from_path}: {error}" for from_path, error in page_errors)
+            if gone:
+                rebuilt.extend(remove_stale_pages(manifest, set(sources), dest_dir))
+            record_depends(manifest, depends)
+            generate_tag_pages(records, outputs, template_path, dest_dir, manifest, minify, assets, fsync)
+            indexes = update_site_indexes(manifest, dest_dir, indexing, base_url, search_terms)
+            rebuilt.extend(os.path.join(dest_dir, output) for output in indexes)
+
+    for path in static_touched:
+        dest = os.path.join(dest_dir, os.path.relpath(path, static_dir))
+        if path in changed:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            copy_file(path, dest)
+        elif os.path.isfile(dest):
+            os.remove(dest)
+        rebuilt.append(dest)
+    return rebuilt, errors
+
+
+def start_server(directory, port):
+    return subprocess.Popen([sys.executable, SERVER_SCRIPT, "--dir", directory, "--port", str(port)])
+
+
+def watch(content_dir, template_path, static_dir, dest_dir, manifest, manifest_path, interval=0.05, port=None,
+          minify=False, assets=None, cache_dir=None, fsync=False, site_index=False, base_url=None, explain=False,
+          search_terms=None):
+    server = start_server(dest_dir, port) if port else None
+    watched = [content_dir, static_dir, template_path]
+    previous = snapshot(watched)
+    info(f"Watching {', '.join(watched)} for changes")
+    try:
+        while True:
+            time.sleep(interval)
+            current = snapshot(watched)
+            changed, removed = diff_snapshots(previous, current)
+            previous = current
+            if not changed and not removed:
+                continue
+            start = time.perf_counter()
+            rebuilt, errors = rebuild_changes(changed, removed, content_dir, template_path, static_dir,
+                                              dest_dir, manifest, minify, assets, cache_dir, fsync, site_index,
+                                              base_url, explain, search_terms)
+            save_manifest(manifest, manifest_path)
+            if search_terms is not None:
+                search_terms.save()
+            info(f"Rebuilt {len(rebuilt)} files in {(time.perf_counter() - start) * 1000:.1f}ms")
+            for error in errors:
+                print(f"  {error}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,263 @@
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+import types
+import unittest
+from email.utils import formatdate
+from functools import partial
+
+from server import *
+
+
+class ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.write("index.html", "<p>home</p>")
+        # Every test gets its own cache, class attributes would otherwise leak between them
+        self.handler = type("Handler", (CachingHTTPRequestHandler,),
+                            {"file_cache": FileCache(), "asset_map": AssetMap(), "quiet": True})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), partial(self.handler, directory=self.tmp.name))
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.server.server_address[1], timeout=5)
+
+    def tearDown(self):
+        self.connection.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def write(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb' if isinstance(data, bytes) else 'w') as f:
+            f.write(data)
+        return path
+
+    def get(self, path="/", **headers):
+        self.connection.request("GET", path, headers={name.replace("_", "-"): value
+                                                      for name, value in headers.items()})
+        response = self.connection.getresponse()
+        return response, response.read()
+
+
+class TestConditionalRequests(ServerTestCase):
+    def test_etag_revalidation(self):
+        response, body = self.get("/index.html")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>home</p>")
+        self.assertEqual(response.getheader("Content-Length"), str(len(body)))
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+        etag = response.getheader("ETag")
+        response, body = self.get("/index.html", If_None_Match=etag)
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(response.getheader("ETag"), etag)
+        response, _ = self.get("/index.html", If_None_Match=f'"other", W/{etag}')
+        self.assertEqual(response.status, 304)
+        response, _ = self.get("/index.html", If_None_Match='"other"')
+        self.assertEqual(response.status, 200)
+
+    def test_changed_file_gets_a_new_etag(self):
+        response, _ = self.get("/index.html")
+        etag = response.getheader("ETag")
+        path = self.write("index.html", "<p>changed</p>")
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        response, body = self.get("/index.html", If_None_Match=etag)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>changed</p>")
+        self.assertNotEqual(response.getheader("ETag"), etag)
+
+    def test_if_modified_since(self):
+        response, _ = self.get("/index.html")
+        last_modified = response.getheader("Last-Modified")
+        response, _ = self.get("/index.html", If_Modified_Since=last_modified)
+        self.assertEqual(response.status, 304)
+        earlier = formatdate(os.stat(os.path.join(self.tmp.name, "index.html")).st_mtime - 60, usegmt=True)
+        response, _ = self.get("/index.html", If_Modified_Since=earlier)
+        self.assertEqual(response.status, 200)
+        # If-None-Match wins when both are sent
+        response, _ = self.get("/index.html", If_Modified_Since=last_modified, If_None_Match='"other"')
+        self.assertEqual(response.status, 200)
+        response, _ = self.get("/index.html", If_Modified_Since="not a date")
+        self.assertEqual(response.status, 200)
+
+    def test_keep_alive(self):
+        response, _ = self.get("/")
+        self.assertEqual(response.version, 11)
+        self.assertFalse(response.will_close)
+        sock = self.connection.sock
+        for path in ("/index.html", "/", "/index.html"):
+            response, body = self.get(path)
+            self.assertEqual(response.getheader("Content-Length"), str(len(body)))
+            self.assertFalse(response.will_close)
+        self.assertIs(self.connection.sock, sock)
+        response, body = self.get("/missing.html")
+        self.assertEqual(response.status, 404)
+        self.assertEqual(response.getheader("Content-Length"), str(len(body)))
+        self.get("/", Connection="close")
+        # The server hangs up once the response is out
+        self.assertEqual(self.connection.sock.recv(1), b"")
+
+    def test_large_files_are_sent_whole(self):
+        data = os.urandom(3 * 1024 * 1024)
+        self.write("big.bin", data)
+        response, body = self.get("/big.bin")
+        self.assertEqual(response.getheader("Content-Length"), str(len(data)))
+        self.assertEqual(body, data)
+
+
+class TestImmutableAssets(ServerTestCase):
+    def test_only_mapped_assets_are_immutable(self):
+        self.write("index.3f2a1c8d.css", "body {}")
+        self.write("build.deadbeef.js", "let x")
+        response, _ = self.get("/index.3f2a1c8d.css")
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+        self.write(ASSET_MANIFEST, json.dumps({"/index.css": "/index.3f2a1c8d.css"}))
+        response, _ = self.get("/index.3f2a1c8d.css")
+        self.assertEqual(response.getheader("Cache-Control"), IMMUTABLE_CACHE_CONTROL)
+        response, _ = self.get("/index.3f2a1c8d.css", If_None_Match=response.getheader("ETag"))
+        self.assertEqual(response.getheader("Cache-Control"), IMMUTABLE_CACHE_CONTROL)
+        response, _ = self.get("/build.deadbeef.js")
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+
+    def test_unreadable_asset_map(self):
+        self.write(ASSET_MANIFEST, "not json")
+        response, _ = self.get("/index.html")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Cache-Control"), "no-cache")
+
+
+class TestRanges(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("data.txt", "0123456789")
+
+    def test_ranges(self):
+        for header, status, body, content_range in [
+            ("bytes=2-5", 206, b"2345", "bytes 2-5/10"),
+            ("bytes=7-", 206, b"789", "bytes 7-9/10"),
+            ("bytes=8-20", 206, b"89", "bytes 8-9/10"),
+            ("bytes=-3", 206, b"789", "bytes 7-9/10"),
+            ("bytes=-30", 206, b"0123456789", "bytes 0-9/10"),
+            ("bytes=0-1,4-5", 200, b"0123456789", None),
+            ("items=0-1", 200, b"0123456789", None),
+        ]:
+            response, data = self.get("/data.txt", Range=header)
+            self.assertEqual((response.status, data), (status, body), header)
+            self.assertEqual(response.getheader("Content-Range"), content_range, header)
+            self.assertEqual(response.getheader("Content-Length"), str(len(body)), header)
+
+    def test_unsatisfiable_range(self):
+        for header in ("bytes=10-", "bytes=5-2"):
+            response, data = self.get("/data.txt", Range=header)
+            self.assertEqual(response.status, 416, header)
+            self.assertEqual(response.getheader("Content-Range"), "bytes */10")
+            self.assertEqual(data, b"")
+
+    def test_if_range(self):
+        response, _ = self.get("/data.txt")
+        etag = response.getheader("ETag")
+        response, data = self.get("/data.txt", Range="bytes=0-1", If_Range=etag)
+        self.assertEqual((response.status, data), (206, b"01"))
+        # A stale validator means the client's partial copy is out of date, it gets the whole file
+        response, data = self.get("/data.txt", Range="bytes=0-1", If_Range='"stale"')
+        self.assertEqual((response.status, data), (200, b"0123456789"))
+
+    def test_range_of_a_large_file(self):
+        data = os.urandom(2 * 1024 * 1024)
+        self.write("big.bin", data)
+        response, body = self.get("/big.bin", Range="bytes=1000-1999")
+        self.assertEqual(response.status, 206)
+        self.assertEqual(body, data[1000:2000])
+        response, body = self.get("/big.bin", Range="bytes=-10")
+        self.assertEqual(body, data[-10:])
+
+
+class TestFileCache(ServerTestCase):
+    def stat(self, mtime, size):
+        return types.SimpleNamespace(st_mtime_ns=mtime, st_size=size)
+
+    def test_least_recently_used_files_are_evicted(self):
+        cache = FileCache(max_bytes=10, max_file_size=8)
+        cache.put("a", self.stat(1, 4), b"aaaa")
+        cache.put("b", self.stat(1, 4), b"bbbb")
+        self.assertEqual(cache.get("a", self.stat(1, 4)), b"aaaa")
+        cache.put("c", self.stat(1, 4), b"cccc")
+        self.assertIsNone(cache.get("b", self.stat(1, 4)))
+        self.assertEqual(list(cache.entries), ["a", "c"])
+        self.assertEqual(cache.size, 8)
+        cache.put("d", self.stat(1, 9), b"d" * 9)
+        self.assertNotIn("d", cache.entries)
+
+    def test_changed_files_are_dropped(self):
+        cache = FileCache()
+        cache.put("a", self.stat(1, 4), b"aaaa")
+        self.assertIsNone(cache.get("a", self.stat(2, 4)))
+        self.assertEqual(cache.size, 0)
+
+    def test_hot_files_are_served_from_memory(self):
+        self.get("/index.html")
+        cache = self.handler.file_cache
+        self.assertIn(os.path.join(self.tmp.name, "index.html"), cache.entries)
+
+    def test_no_budget_means_nothing_is_read_into_memory(self):
+        cache = FileCache(max_bytes=0)
+        self.handler.file_cache = cache
+        response, body = self.get("/index.html", Range="bytes=3-6")
+        self.assertEqual((response.status, body), (206, b"home"))
+        self.assertEqual(cache.entries, {})
+
+
+class TestEncodings(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        source = os.path.join(self.tmp.name, "index.html")
+        mtime = os.stat(source).st_mtime_ns
+        for suffix in (".br", ".zst", ".gz"):
+            # The build stamps siblings with their source's mtime
+            os.utime(self.write(f"index.html{suffix}", f"compressed{suffix}".encode()), ns=(mtime, mtime))
+
+    def variant(self, accept_encoding):
+        response, body = self.get("/index.html", Accept_Encoding=accept_encoding)
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(response.getheader("Content-Type"), "text/html")
+        return response.getheader("Content-Encoding"), body
+
+    def test_preference_order(self):
+        self.assertEqual(self.variant("gzip, zstd, br"), ("br", b"compressed.br"))
+        self.assertEqual(self.variant("gzip;q=1.0, zstd;q=0.5"), ("zstd", b"compressed.zst"))
+        self.assertEqual(self.variant("GZIP"), ("gzip", b"compressed.gz"))
+        self.assertEqual(self.variant("identity"), (None, b"<p>home</p>"))
+        self.assertEqual(self.variant("deflate"), (None, b"<p>home</p>"))
+
+    def test_refused_encodings(self):
+        self.assertEqual(self.variant("br;q=0, gzip"), ("gzip", b"compressed.gz"))
+        self.assertEqual(self.variant("br;q=0, zstd;q=0.0, gzip;q=0"), (None, b"<p>home</p>"))
+        self.assertEqual(self.variant("gzip;q=oops"), (None, b"<p>home</p>"))
+
+    def test_wildcard(self):
+        self.assertEqual(self.variant("*"), ("br", b"compressed.br"))
+        self.assertEqual(self.variant("br;q=0, *"), ("zstd", b"compressed.zst"))
+        self.assertEqual(self.variant("gzip, *;q=0"), ("gzip", b"compressed.gz"))
+
+    def test_stale_siblings_are_ignored(self):
+        os.utime(os.path.join(self.tmp.name, "index.html.br"), ns=(1, 1))
+        self.assertEqual(self.variant("br, gzip"), ("gzip", b"compressed.gz"))
+
+    def test_each_variant_has_its_own_etag(self):
+        plain, _ = self.get("/index.html")
+        encoded, _ = self.get("/index.html", Accept_Encoding="br")
+        self.assertEqual(plain.getheader("Vary"), "Accept-Encoding")
+        self.assertNotEqual(plain.getheader("ETag"), encoded.getheader("ETag"))
+        response, _ = self.get("/index.html", Accept_Encoding="br", If_None_Match=encoded.getheader("ETag"))
+        self.assertEqual(response.status, 304)
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        response, _ = self.get("/index.html", Accept_Encoding="gzip", If_None_Match=encoded.getheader("ETag"))
+        self.assertEqual(response.status, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()